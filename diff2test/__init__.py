@@ -1,14 +1,49 @@
-from typing import List, Optional
+import dataclasses
+import logging
+import queue
+import re
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
 
-from diff2test.ai_client import generate_text_from_prompt
-from diff2test.file_writer import save_test_code_to_file
+from diff2test import cache
+from diff2test.ai_client import generate_text_from_prompt, warm_up_vertex_ai
+from diff2test.file_writer import save_test_codes_batch
 from diff2test.git_handler import get_current_changes, get_diff_between_commits
 from diff2test.logger import logger
 from diff2test.models import AIConfig, DiffInfo
-from diff2test.prompt_builder import create_test_prompt_for_diff
-from diff2test.response_parser import extract_python_code_from_response
+from diff2test.prompt_builder import (
+    create_batch_test_prompt_for_diffs,
+    create_test_prompt_for_diff,
+)
+from diff2test.response_parser import (
+    extract_python_code_from_response,
+    extract_python_code_per_file,
+)
 
 
+# Upper bound for concurrent Vertex AI requests in non-interactive mode.
+MAX_PARALLEL_AI_REQUESTS = 8
+# Number of prompts built ahead of the request currently being submitted.
+PROMPT_PREFETCH_SIZE = 2
+# Estimated prompt tokens per request when several small diffs are batched together.
+DEFAULT_BATCH_TOKEN_BUDGET = 6000
+
+# Output token budget per diff: a base amount plus a few tokens per diff line,
+# capped by AIConfig.max_output_tokens. Batched requests add up the budgets of their files.
+BASE_OUTPUT_TOKENS = 256
+OUTPUT_TOKENS_PER_DIFF_LINE = 4
+MAX_BATCH_OUTPUT_TOKENS = 8192
+
+# An added or removed line in a unified diff, excluding the "---"/"+++" file headers.
+_CHANGED_LINE_RE = re.compile(r"^(?!\+\+\+ |--- )[+-]", re.MULTILINE)
+
+# Answers accepted by the per-file prompt of the legacy interactive mode.
+_VALID_CHOICES: frozenset[str] = frozenset(("y", "n", "q", ""))
+
+T = TypeVar("T")
+
 __all__ = [
     "process_current_changes",
     "process_commit_range",
@@ -21,14 +56,30 @@ def process_current_changes(
     output_dir: Optional[str] = None,
     interactive: bool = False,
     target: Optional[str] = None,
+    stream: bool = False,
+    use_cache: bool = True,
+    batch: bool = False,
+    interactive_legacy: bool = False,
 ):
     """
-    Generates tests for changes from the last commit to the current state (simulation).
+    Generates tests for changes from the last commit to the current state.
     """
-    logger.info(f"[Library] Processing current changes...")
-    logger.info(f"[Library] Using Vertex AI Project ID: {project_id}, Region: {region}")
+    logger.info("[Library] Processing current changes...")
+    logger.info(
+        "[Library] Using Vertex AI Project ID: %s, Region: %s", project_id, region
+    )
     diff_infos = get_current_changes(target=target)
-    _process_diff_infos(project_id, region, diff_infos, output_dir, interactive)
+    _process_diff_infos(
+        project_id,
+        region,
+        diff_infos,
+        output_dir,
+        interactive,
+        stream=stream,
+        use_cache=use_cache,
+        batch=batch,
+        interactive_legacy=interactive_legacy,
+    )
 
 
 def process_commit_range(
@@ -39,99 +90,540 @@ def process_commit_range(
     output_dir: Optional[str] = None,
     interactive: bool = False,
     target: Optional[str] = None,
+    stream: bool = False,
+    use_cache: bool = True,
+    batch: bool = False,
+    interactive_legacy: bool = False,
 ):
     """
-    Generates tests for changes between two commits (simulation).
+    Generates tests for changes between two commits.
     """
-    logger.info(f"[Library] Processing changes between {commit_a} and {commit_b}...")
-    logger.info(f"[Library] Using Vertex AI Project ID: {project_id}, Region: {region}")
+    logger.info("[Library] Processing changes between %s and %s...", commit_a, commit_b)
+    logger.info(
+        "[Library] Using Vertex AI Project ID: %s, Region: %s", project_id, region
+    )
     diff_infos = get_diff_between_commits(commit_a, commit_b, target=target)
-    _process_diff_infos(project_id, region, diff_infos, output_dir, interactive)
+    _process_diff_infos(
+        project_id,
+        region,
+        diff_infos,
+        output_dir,
+        interactive,
+        stream=stream,
+        use_cache=use_cache,
+        batch=batch,
+        interactive_legacy=interactive_legacy,
+    )
 
 
 def _process_diff_infos(
     project_id: str,
     region: str,
-    diff_infos: List[DiffInfo],
+    diff_infos: Iterable[DiffInfo],
     output_dir: str | None = None,
     interactive: bool = False,
+    stream: bool = False,
+    use_cache: bool = True,
+    batch: bool = False,
+    interactive_legacy: bool = False,
 ):
     """
-    Processes a list of DiffInfo objects and generates test code for each diff.
+    Processes DiffInfo objects and generates test code for each diff.
     This is a utility function that can be used internally or by other modules.
     """
     ai_config = AIConfig(
         project_id=project_id,
         region=region,
         model_name="gemini-2.0-flash-001",  # Default model, can be changed
+        stream=stream,
+        use_cache=use_cache,
     )
     orchestrate_test_generation(
-        diff_infos, ai_config, output_dir=output_dir, interactive=interactive
+        diff_infos,
+        ai_config,
+        output_dir=output_dir,
+        interactive=interactive,
+        batch_token_budget=DEFAULT_BATCH_TOKEN_BUDGET if batch else None,
+        interactive_legacy=interactive_legacy,
+        warm_up=True,
     )
 
 
 def orchestrate_test_generation(
-    diff_infos: List[DiffInfo],
+    diff_infos: Iterable[DiffInfo],
     ai_config: AIConfig,
     output_dir: Optional[str],
     interactive: bool = False,
+    batch_token_budget: Optional[int] = None,
+    interactive_legacy: bool = False,
+    warm_up: bool = False,
 ):
     processed_files_count = 0
-    saved_file_paths = []
+    saved_files_count = 0
+    files_to_save: List[Tuple[str, str]] = []
 
-    for i, diff_info in enumerate(diff_infos):
+    # The git handler yields diffs lazily; this is the one place they are buffered.
+    diff_infos = list(diff_infos)
+    total = len(diff_infos)
+
+    meaningful_diff_infos = [d for d in diff_infos if _has_meaningful_diff(d)]
+    skipped_count = total - len(meaningful_diff_infos)
+    if skipped_count:
         logger.info(
-            f"\n--- Processing file {i + 1}/{len(diff_infos)}: {diff_info.file_path} ---"
+            "Skipping %s file(s) without line changes (empty, mode-only or binary diffs).",
+            skipped_count,
         )
+    diff_infos = meaningful_diff_infos
 
+    if interactive_legacy:
+        generated_results = _generate_interactively(diff_infos, ai_config)
+    else:
         if interactive:
-            logger.info("\nDiff content:")
-            logger.info("--------------------------------------------------")
-            logger.info(diff_info.diff_content)
-            logger.info("--------------------------------------------------")
-
-            while True:
-                choice = input(
-                    "Generate unit tests for this file? (y/N/q)uit: "
-                ).lower()
-                if choice in ["y", "n", "q", ""]:
-                    if choice == "":
-                        choice = "n"
-                    break
-                logger.info("Invalid input. Please enter 'y', 'n', or 'q'.")
-
-            if choice == "n":
-                logger.info(f"Skipping test generation for {diff_info.file_path}")
-                continue
-            elif choice == "q":
-                logger.info("Operation aborted by user.")
-                break
-
-        prompt = create_test_prompt_for_diff(diff_info)
-        raw_ai_text = generate_text_from_prompt(prompt, ai_config)
-        generated_code = None
-        if raw_ai_text:
-            generated_code = extract_python_code_from_response(raw_ai_text)
+            diff_infos = _select_diff_infos(diff_infos)
+            if diff_infos is None:
+                return
+        generated_results = _generate_in_parallel(
+            diff_infos, ai_config, batch_token_budget=batch_token_budget, warm_up=warm_up
+        )
 
+    for diff_info, generated_code in generated_results:
         if generated_code:
             processed_files_count += 1
             if output_dir:
-                saved_path = save_test_code_to_file(
-                    diff_info.file_path, generated_code, output_dir
-                )
-                if saved_path:
-                    saved_file_paths.append(saved_path)
+                files_to_save.append((diff_info.file_path, generated_code))
             else:
-                logger.info(f"\n# Suggested tests for: {diff_info.file_path}")
+                logger.info("\n# Suggested tests for: %s", diff_info.file_path)
                 logger.info("# --------------------------------------------------")
                 logger.info(generated_code)
                 logger.info("# --------------------------------------------------\n")
         else:
-            logger.info(f"No test code could be generated for: {diff_info.file_path}")
+            logger.info("No test code could be generated for: %s", diff_info.file_path)
+
+    # The files are saved together once all results are in, so several of them can
+    # share one io_uring submission (or the file writer's thread pool) instead of
+    # being written one at a time.
+    if files_to_save:
+        saved_paths = save_test_codes_batch(files_to_save, output_dir)
+        # Failed saves are already reported by the file writer.
+        for (file_path, _), saved_path in zip(files_to_save, saved_paths):
+            if saved_path:
+                saved_files_count += 1
+                logger.info("Saved tests for %s to: %s", file_path, saved_path)
 
     if output_dir:
         logger.info(
-            f"\nProcessed {processed_files_count} files. Tests saved to '{output_dir}'."
+            "\nProcessed %s files. Saved %s test file(s) to '%s'.",
+            processed_files_count,
+            saved_files_count,
+            output_dir,
         )
     else:
-        logger.info(f"\nProcessed {processed_files_count} files.")
+        logger.info("\nProcessed %s files.", processed_files_count)
+
+
+def _has_meaningful_diff(diff_info: DiffInfo) -> bool:
+    """
+    Returns True if the diff adds or removes at least one line of text.
+    Empty, whitespace-only, mode-only and binary diffs can't produce useful tests,
+    so they are not worth an AI request.
+    """
+    diff_content = diff_info.diff_content
+    if not diff_content or not diff_content.strip():
+        return False
+    if "Binary files" in diff_content:
+        return False
+    return _CHANGED_LINE_RE.search(diff_content) is not None
+
+
+def _generate_test_code(diff_info: DiffInfo, ai_config: AIConfig) -> Optional[str]:
+    """
+    Builds the prompt for a single diff, calls the AI model and extracts the test code.
+    With ai_config.use_cache set, test code generated for the same diff before is reused.
+    """
+    cache_key = None
+    if ai_config.use_cache:
+        cache_key = _get_test_code_cache_key(diff_info, ai_config)
+        cached_code = cache.get(cache_key)
+        if cached_code is not None:
+            return cached_code
+
+    prompt = create_test_prompt_for_diff(diff_info)
+    raw_ai_text = generate_text_from_prompt(
+        prompt, _with_output_token_budget(ai_config, [diff_info])
+    )
+    if not raw_ai_text:
+        return None
+    generated_code = extract_python_code_from_response(raw_ai_text)
+    if cache_key and generated_code:
+        cache.put(cache_key, generated_code)
+    return generated_code
+
+
+def _get_test_code_cache_key(diff_info: DiffInfo, ai_config: AIConfig) -> str:
+    return cache.make_key(
+        diff_info.file_path, diff_info.diff_content, ai_config.model_name
+    )
+
+
+def _select_diff_infos(diff_infos: List[DiffInfo]) -> Optional[List[DiffInfo]]:
+    """
+    Shows all changed files at once and lets the user pick the ones to generate tests for.
+    The selected diffs are then processed together, so the AI requests can run in parallel
+    instead of waiting for the user between files.
+
+    Returns:
+        The selected diffs in their original order, or None if the user aborted.
+    """
+    if not diff_infos:
+        return diff_infos
+
+    logger.info("\nChanged files:")
+    for i, diff_info in enumerate(diff_infos, start=1):
+        added_lines, removed_lines = _count_changed_lines(diff_info)
+        logger.info(
+            "  %3s. %s (+%s/-%s)", i, diff_info.file_path, added_lines, removed_lines
+        )
+
+    while True:
+        selection = input(
+            "Select files to generate tests for (e.g. 1,3,5-8), (a)ll or (q)uit: "
+        )
+        if selection.strip().lower() == "q":
+            logger.info("Operation aborted by user.")
+            return None
+        try:
+            selected_indices = _parse_selection(selection, len(diff_infos))
+        except ValueError as e:
+            logger.info("Invalid selection: %s", e)
+            continue
+        return [diff_infos[i] for i in selected_indices]
+
+
+def _parse_selection(text: str, count: int) -> List[int]:
+    """
+    Parses a selection such as "1,3,5-8" or "a" (all) into sorted, zero-based indices.
+
+    Args:
+        text: The user's input. Numbers are 1-based; ranges are inclusive.
+        count: The number of selectable items.
+
+    Raises:
+        ValueError: If the selection is empty, malformed or out of range.
+    """
+    text = text.strip().lower()
+    if text in ("a", "all"):
+        return list(range(count))
+    if not text:
+        raise ValueError("no files selected.")
+
+    selected = set()
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start_text, separator, end_text = part.partition("-")
+        try:
+            start = int(start_text)
+            end = int(end_text) if separator else start
+        except ValueError:
+            raise ValueError(f"'{part}' is not a number or range.") from None
+        if start > end:
+            raise ValueError(f"'{part}' is an empty range.")
+        if start < 1 or end > count:
+            raise ValueError(f"'{part}' is out of range (1-{count}).")
+        selected.update(range(start - 1, end))
+
+    if not selected:
+        raise ValueError("no files selected.")
+    return sorted(selected)
+
+
+def _count_changed_lines(diff_info: DiffInfo) -> Tuple[int, int]:
+    added_lines = removed_lines = 0
+    for match in _CHANGED_LINE_RE.finditer(diff_info.diff_content):
+        if match.group() == "+":
+            added_lines += 1
+        else:
+            removed_lines += 1
+    return added_lines, removed_lines
+
+
+def _generate_interactively(
+    diff_infos: List[DiffInfo], ai_config: AIConfig
+) -> Iterator[Tuple[DiffInfo, Optional[str]]]:
+    """
+    Legacy interactive mode: asks the user file by file and generates tests serially
+    for the accepted ones.
+    Yields (diff_info, generated_code) pairs as soon as each file is done.
+    """
+    for i, diff_info in enumerate(diff_infos):
+        logger.info(
+            "\n--- Processing file %s/%s: %s ---",
+            i + 1,
+            len(diff_infos),
+            diff_info.file_path,
+        )
+        # The diff can be tens of KB; skip emitting it entirely when INFO is filtered out.
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("\nDiff content:")
+            logger.info("--------------------------------------------------")
+            logger.info(diff_info.diff_content)
+            logger.info("--------------------------------------------------")
+
+        while True:
+            choice = input("Generate unit tests for this file? (y/N/q)uit: ").lower()
+            if choice in _VALID_CHOICES:
+                if choice == "":
+                    choice = "n"
+                break
+            logger.info("Invalid input. Please enter 'y', 'n', or 'q'.")
+
+        if choice == "n":
+            logger.info("Skipping test generation for %s", diff_info.file_path)
+            continue
+        elif choice == "q":
+            logger.info("Operation aborted by user.")
+            break
+
+        yield diff_info, _generate_test_code(diff_info, ai_config)
+
+
+def _generate_in_parallel(
+    diff_infos: List[DiffInfo],
+    ai_config: AIConfig,
+    batch_token_budget: Optional[int] = None,
+    warm_up: bool = False,
+) -> Iterator[Tuple[DiffInfo, Optional[str]]]:
+    """
+    Sends the prompts for all diffs concurrently and yields the results
+    in the original order of diff_infos.
+    AI calls are network-bound, so threads overlap the waiting time of each request.
+    A result is yielded as soon as it and all results before it have arrived,
+    so the caller can handle it while later requests are still in flight.
+
+    If batch_token_budget is given, small diffs are grouped so that several files
+    share one request, as long as their estimated size stays within the budget.
+    With ai_config.use_cache set, diffs whose test code is already cached are not
+    sent at all, so one changed file doesn't invalidate the whole batch it lands in.
+    With warm_up set, Vertex AI is prepared before the first request, but only if
+    at least one request will actually be sent.
+    """
+    if not diff_infos:
+        return
+
+    # Identical diffs are sent only once; their result is copied to every duplicate.
+    duplicates_by_index = _group_identical_diffs(diff_infos)
+    unique_indices = list(duplicates_by_index)
+    if len(unique_indices) < len(diff_infos):
+        logger.info(
+            "Found %s duplicate diff(s); generating tests once per unique diff.",
+            len(diff_infos) - len(unique_indices),
+        )
+
+    generated_codes: Dict[int, Optional[str]] = {}
+    next_index = 0
+
+    cache_keys: Dict[int, str] = {}
+    if ai_config.use_cache:
+        uncached_indices = []
+        for i in unique_indices:
+            cache_keys[i] = _get_test_code_cache_key(diff_infos[i], ai_config)
+            cached_code = cache.get(cache_keys[i])
+            if cached_code is None:
+                uncached_indices.append(i)
+                continue
+            for member_index in duplicates_by_index[i]:
+                generated_codes[member_index] = cached_code
+        if len(uncached_indices) < len(unique_indices):
+            logger.info(
+                "Reusing cached tests for %s file(s).",
+                len(unique_indices) - len(uncached_indices),
+            )
+        unique_indices = uncached_indices
+
+    while next_index in generated_codes:
+        yield diff_infos[next_index], generated_codes.pop(next_index)
+        next_index += 1
+    if not unique_indices:
+        return
+
+    if batch_token_budget:
+        unique_diff_infos = [diff_infos[i] for i in unique_indices]
+        batches = [
+            [unique_indices[j] for j in batch]
+            for batch in _group_into_batches(unique_diff_infos, batch_token_budget)
+        ]
+    else:
+        batches = [[i] for i in unique_indices]
+
+    if warm_up:
+        # Prepare Vertex AI on this thread before the requests fan out.
+        warm_up_vertex_ai(ai_config)
+
+    # Streamed chunks are written straight to stdout, so concurrent streams would interleave.
+    max_workers = min(MAX_PARALLEL_AI_REQUESTS, len(batches))
+    if ai_config.stream:
+        max_workers = 1
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Prompts are built on a separate thread, so the first requests are already
+        # in flight while the prompts for later batches are still being built.
+        futures = {
+            executor.submit(generate_text_from_prompt, prompt, batch_ai_config): batch
+            for batch, prompt, batch_ai_config in _prefetch(
+                _build_batch_prompts(diff_infos, batches, ai_config),
+                PROMPT_PREFETCH_SIZE,
+            )
+        }
+        for future in as_completed(futures):
+            batch = futures[future]
+            batch_diff_infos = [diff_infos[i] for i in batch]
+            logger.info(
+                "--- Received response for: %s ---",
+                ", ".join(d.file_path for d in batch_diff_infos),
+            )
+            batch_codes = _extract_codes_for_batch(future.result(), batch_diff_infos)
+            for i, generated_code in zip(batch, batch_codes):
+                if generated_code and i in cache_keys:
+                    cache.put(cache_keys[i], generated_code)
+                for member_index in duplicates_by_index[i]:
+                    generated_codes[member_index] = generated_code
+
+            while next_index in generated_codes:
+                yield diff_infos[next_index], generated_codes.pop(next_index)
+                next_index += 1
+
+
+def _build_batch_prompts(
+    diff_infos: List[DiffInfo], batches: List[List[int]], ai_config: AIConfig
+) -> Iterator[Tuple[List[int], str, AIConfig]]:
+    """
+    Yields the batch, its prompt and the AI config to send it with, one batch at a time.
+    """
+    for batch in batches:
+        batch_diff_infos = [diff_infos[i] for i in batch]
+        yield (
+            batch,
+            _create_prompt_for_batch(batch_diff_infos),
+            _with_output_token_budget(ai_config, batch_diff_infos),
+        )
+
+
+def _prefetch(items: Iterator[T], maxsize: int) -> Iterator[T]:
+    """
+    Consumes items on a background thread and yields them in order,
+    keeping at most maxsize items ready ahead of the caller.
+    An exception raised while producing items is re-raised in the caller.
+    """
+    buffer: "queue.Queue[Tuple[bool, object]]" = queue.Queue(maxsize=maxsize)
+
+    def produce() -> None:
+        try:
+            for item in items:
+                buffer.put((True, item))
+        except Exception as e:
+            buffer.put((False, e))
+        else:
+            buffer.put((False, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        has_item, value = buffer.get()
+        if not has_item:
+            if value is not None:
+                raise value
+            return
+        yield value
+
+
+def _group_identical_diffs(diff_infos: List[DiffInfo]) -> Dict[int, List[int]]:
+    """
+    Groups diffs with identical content.
+    The diff text itself is the key: str hashes are computed once and cached,
+    so unlike a digest, grouping doesn't need an extra UTF-8 encoding pass.
+
+    Returns:
+        A dict mapping the index of the first diff of each group to the indices of
+        all its members (including itself), in original order.
+    """
+    groups: Dict[str, List[int]] = defaultdict(list)
+    for i, diff_info in enumerate(diff_infos):
+        groups[diff_info.diff_content].append(i)
+    return {members[0]: members for members in groups.values()}
+
+
+def _group_into_batches(
+    diff_infos: List[DiffInfo], token_budget: int
+) -> List[List[int]]:
+    """
+    Groups consecutive diffs (by index) so that the estimated token count of each group
+    stays within token_budget. A diff larger than the budget gets a group of its own.
+    """
+    batches: List[List[int]] = []
+    current_batch: List[int] = []
+    current_tokens = 0
+
+    for i, diff_info in enumerate(diff_infos):
+        diff_tokens = _estimate_tokens(diff_info.file_path) + _estimate_tokens(
+            diff_info.diff_content
+        )
+        if current_batch and current_tokens + diff_tokens > token_budget:
+            batches.append(current_batch)
+            current_batch, current_tokens = [], 0
+        current_batch.append(i)
+        current_tokens += diff_tokens
+
+    if current_batch:
+        batches.append(current_batch)
+    return batches
+
+
+def _estimate_tokens(text: str) -> int:
+    # Rough heuristic: about four characters per token for code and English text.
+    return len(text) // 4
+
+
+def _estimate_output_tokens(diff_info: DiffInfo, max_output_tokens: int) -> int:
+    diff_line_count = diff_info.diff_content.count("\n") + 1
+    return min(
+        max_output_tokens,
+        BASE_OUTPUT_TOKENS + OUTPUT_TOKENS_PER_DIFF_LINE * diff_line_count,
+    )
+
+
+def _with_output_token_budget(
+    ai_config: AIConfig, batch_diff_infos: List[DiffInfo]
+) -> AIConfig:
+    """
+    Returns a copy of ai_config whose max_output_tokens fits the size of the diffs.
+    Small diffs don't need long answers, and output length dominates request latency.
+    ai_config.max_output_tokens stays the limit per file; a copy is returned because
+    the same config is shared by concurrent requests.
+    """
+    output_tokens = sum(
+        _estimate_output_tokens(d, ai_config.max_output_tokens)
+        for d in batch_diff_infos
+    )
+    if len(batch_diff_infos) > 1:
+        output_tokens = min(output_tokens, MAX_BATCH_OUTPUT_TOKENS)
+    return dataclasses.replace(ai_config, max_output_tokens=output_tokens)
+
+
+def _create_prompt_for_batch(batch_diff_infos: List[DiffInfo]) -> str:
+    if len(batch_diff_infos) == 1:
+        return create_test_prompt_for_diff(batch_diff_infos[0])
+    return create_batch_test_prompt_for_diffs(batch_diff_infos)
+
+
+def _extract_codes_for_batch(
+    raw_ai_text: Optional[str], batch_diff_infos: List[DiffInfo]
+) -> List[Optional[str]]:
+    """
+    Returns the generated code of each diff in the batch, in the same order.
+    """
+    if not raw_ai_text:
+        return [None] * len(batch_diff_infos)
+    if len(batch_diff_infos) == 1:
+        return [extract_python_code_from_response(raw_ai_text)]
+
+    codes_by_file = extract_python_code_per_file(raw_ai_text)
+    return [codes_by_file.get(d.file_path) for d in batch_diff_infos]
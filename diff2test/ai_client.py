@@ -1,4 +1,11 @@
 # diff2test/ai_client.py
+import functools
+import os
+import random
+import sys
+import threading
+import time
+
 import vertexai
 from vertexai.generative_models import (
     GenerativeModel,
@@ -8,6 +15,9 @@ from vertexai.generative_models import (
 )
 from google.api_core import exceptions as google_exceptions  # For specific API errors
 
+from diff2test.cache import get_cache_dir as _get_cache_dir
+from diff2test.cache import make_key as _make_cache_key
+from diff2test.cache import write_text_atomically as _write_text_atomically
 from diff2test.logger import logger
 from .models import AIConfig  # Assuming AIConfig is in models.py
 
@@ -15,12 +25,47 @@ from .models import AIConfig  # Assuming AIConfig is in models.py
 # but initializing it per call (if project/location might change or for simplicity)
 # is also fine as vertexai.init is idempotent for the same params.
 _vertex_ai_initialized_configs = set()
+_vertex_ai_init_lock = threading.Lock()
+
+# Configure safety settings to be less restrictive for code generation if needed.
+# Be mindful of responsible AI practices. For this example, we'll set a common threshold.
+# The settings never change, so they are built once and shared by all requests.
+SAFETY_SETTINGS = {
+    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+}
+
+# Errors that usually go away on their own (quota bursts, overloaded or slow backends).
+# Other API errors such as PermissionDenied, NotFound or InvalidArgument are not retried.
+RETRYABLE_API_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+)
+MAX_RETRY_DELAY_SECONDS = 30
+
+# Log messages for API errors that are not retried (or ran out of retries).
+_API_ERROR_MESSAGES = {
+    google_exceptions.PermissionDenied: "Permission Denied for Vertex AI. Ensure API is enabled and credentials are correct",
+    google_exceptions.NotFound: "Model or resource not found. Check model name and region",
+    google_exceptions.ResourceExhausted: "Vertex AI resource quota exhausted",
+    google_exceptions.InvalidArgument: "Invalid argument to Vertex AI API (check prompt, model, or safety settings)",
+}
+
+# In-process cache in front of the disk cache, so a prompt repeated within one run
+# doesn't touch the filesystem again.
+_response_memory_cache: dict[str, str] = {}
 
 
 def generate_text_from_prompt(prompt: str, ai_config: AIConfig) -> str | None:
     """
     Sends a prompt to the specified Vertex AI Gemini model and returns the text response.
 
+    If ai_config.use_cache is set, responses are looked up in (and stored to) a cache
+    keyed by the prompt and model name, so identical requests skip the API call.
+
     Args:
         prompt: The prompt string to send to the model.
         ai_config: An AIConfig object with project_id, region, and model_name.
@@ -32,86 +77,242 @@ def generate_text_from_prompt(prompt: str, ai_config: AIConfig) -> str | None:
         logger.info("[AIClient] Prompt is empty. Skipping API call.")
         return None
 
+    if not ai_config.use_cache:
+        return _request_text_from_model(prompt, ai_config)
+
+    cache_key = _get_response_cache_key(prompt, ai_config.model_name)
+    cached_text = _read_cached_response(cache_key)
+    if cached_text is not None:
+        logger.info("[AIClient] Using cached response (%s).", cache_key[:12])
+        return cached_text
+
+    response_text = _request_text_from_model(prompt, ai_config)
+    if response_text:
+        _write_cached_response(cache_key, response_text)
+    return response_text
+
+
+def _request_text_from_model(prompt: str, ai_config: AIConfig) -> str | None:
+    """
+    Calls the Vertex AI model for the prompt without consulting the response cache.
+    """
     try:
         _initialize_vertex_ai(ai_config)  # Ensure Vertex AI is initialized
     except Exception as e:
         # Initialization already prints an error, so we just return None here
         # or re-raise if a critical failure should halt the program
-        logger.info(f"[AIClient] Halting due to Vertex AI initialization failure: {e}")
+        logger.info("[AIClient] Halting due to Vertex AI initialization failure: %s", e)
         return None
 
-    logger.info(f"[AIClient] Attempting to load model: {ai_config.model_name}")
     try:
-        model = GenerativeModel(ai_config.model_name)
-        logger.info(f"[AIClient] Model '{ai_config.model_name}' loaded.")
+        model = _get_model(ai_config.model_name, ai_config.project_id, ai_config.region)
     except Exception as e:
-        logger.info(f"[AIClient] Error loading model '{ai_config.model_name}': {e}")
+        logger.info("[AIClient] Error loading model '%s': %s", ai_config.model_name, e)
         return None
 
-    # Configure safety settings to be less restrictive for code generation if needed.
-    # Be mindful of responsible AI practices. For this example, we'll set a common threshold.
-    safety_settings = {
-        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-    }
-
-    # Generation Config (Optional, but can be useful)
-    generation_config = GenerationConfig(
-        temperature=0.2,  # Lower temperature for more deterministic/less creative code
-        max_output_tokens=2048,  # Adjust as needed for test code length
-        # top_p=0.9,
-        # top_k=40
-    )
+    generation_config = _get_generation_config(ai_config.max_output_tokens)
 
     try:
-        response = model.generate_content(
-            prompt,
-            generation_config=generation_config,
-            safety_settings=safety_settings,
-            # stream=False # Set to True if you want to stream the response
-        )
-
-        # Accessing the text:
-        # The exact way to get text can vary slightly. `response.text` is often the simplest.
-        # If `response.text` is not available or empty, try candidates.
-        if hasattr(response, "text") and response.text:
-            return response.text
-        elif response.candidates and response.candidates[0].content.parts:
-            # Concatenate all text parts if there are multiple
-            return "".join(
-                part.text
-                for part in response.candidates[0].content.parts
-                if hasattr(part, "text")
-            )
-        else:
-            logger.info(
-                "[AIClient] No text content found in the model's response or unexpected structure."
-            )
-            logger.info(f"[AIClient] Full response object: {response}")
-            return None
+        for attempt in range(ai_config.max_retries + 1):
+            try:
+                return _generate_text(
+                    model, prompt, generation_config, ai_config.stream
+                )
+            except RETRYABLE_API_ERRORS as e:
+                if attempt == ai_config.max_retries:
+                    raise
+                # Exponential backoff with jitter, so parallel requests don't retry in lockstep.
+                delay = min(2**attempt + random.random(), MAX_RETRY_DELAY_SECONDS)
+                logger.info(
+                    "[AIClient] Transient Vertex AI error (%s). Retrying in %.1fs (retry %s/%s)...",
+                    type(e).__name__,
+                    delay,
+                    attempt + 1,
+                    ai_config.max_retries,
+                )
+                time.sleep(delay)
 
-    except google_exceptions.PermissionDenied as e:
+    except google_exceptions.GoogleAPICallError as e:
         logger.info(
-            f"[AIClient] Permission Denied for Vertex AI. Ensure API is enabled and credentials are correct: {e}"
+            "[AIClient] %s: %s",
+            _API_ERROR_MESSAGES.get(type(e), "Vertex AI API error"),
+            e,
         )
-    except google_exceptions.NotFound as e:
+    except Exception as e:
         logger.info(
-            f"[AIClient] Model or resource not found. Check model name and region: {e}"
+            "[AIClient] An unexpected error occurred while communicating with Vertex AI: %s",
+            e,
         )
-    except google_exceptions.ResourceExhausted as e:
-        logger.info(f"[AIClient] Vertex AI resource quota exhausted: {e}")
-    except google_exceptions.InvalidArgument as e:
-        logger.info(
-            f"[AIClient] Invalid argument to Vertex AI API (check prompt, model, or safety settings): {e}"
+
+    return None
+
+
+def _generate_text(
+    model: GenerativeModel,
+    prompt: str,
+    generation_config: GenerationConfig,
+    stream: bool,
+) -> str | None:
+    """
+    Performs a single generate_content request and returns the response text.
+    API errors are propagated to the caller, which decides whether to retry.
+    """
+    if stream:
+        return _generate_streamed_text(
+            model, prompt, generation_config, SAFETY_SETTINGS
         )
-    except Exception as e:
+
+    response = model.generate_content(
+        prompt,
+        generation_config=generation_config,
+        safety_settings=SAFETY_SETTINGS,
+    )
+
+    response_text = _extract_response_text(response)
+    if response_text:
+        return response_text
+
+    logger.info(
+        "[AIClient] No text content found in the model's response or unexpected structure."
+    )
+    logger.info("[AIClient] Full response object: %s", response)
+    return None
+
+
+def _generate_streamed_text(
+    model: GenerativeModel,
+    prompt: str,
+    generation_config: GenerationConfig,
+    safety_settings: dict,
+) -> str | None:
+    """
+    Requests a streamed response and writes each chunk to stdout as soon as it arrives,
+    so the first tokens are visible without waiting for the whole completion.
+
+    Returns:
+        The concatenated text of all chunks, or None if no text was received.
+    """
+    response_stream = model.generate_content(
+        prompt,
+        generation_config=generation_config,
+        safety_settings=safety_settings,
+        stream=True,
+    )
+
+    parts = []
+    for chunk in response_stream:
+        chunk_text = _extract_response_text(chunk)
+        if chunk_text:
+            parts.append(chunk_text)
+            sys.stdout.write(chunk_text)
+            sys.stdout.flush()
+
+    if not parts:
+        logger.info("[AIClient] No text content found in the streamed response.")
+        return None
+
+    sys.stdout.write("\n")
+    sys.stdout.flush()
+    return "".join(parts)
+
+
+def _extract_response_text(response) -> str | None:
+    """
+    Returns the text of a model response (or a streamed chunk), or None if it has no text.
+    """
+    # Accessing the text:
+    # The exact way to get text can vary slightly. `response.text` is often the simplest.
+    # If `response.text` is not available or empty, try candidates.
+    if hasattr(response, "text") and response.text:
+        return response.text
+    elif response.candidates and response.candidates[0].content.parts:
+        # Concatenate all text parts if there are multiple
+        return "".join(
+            part.text
+            for part in response.candidates[0].content.parts
+            if hasattr(part, "text")
+        )
+    return None
+
+
+@functools.lru_cache(maxsize=8)
+def _get_model(model_name: str, project_id: str, region: str) -> GenerativeModel:
+    """
+    Returns a GenerativeModel, creating it only once per model and Vertex AI project/region.
+    The model resolves its resource name from the project/region given to vertexai.init,
+    so both are part of the cache key. Call _initialize_vertex_ai before this.
+    """
+    logger.info("[AIClient] Attempting to load model: %s", model_name)
+    model = GenerativeModel(model_name)
+    logger.info("[AIClient] Model '%s' loaded.", model_name)
+    return model
+
+
+@functools.lru_cache(maxsize=32)
+def _get_generation_config(max_output_tokens: int) -> GenerationConfig:
+    return GenerationConfig(
+        temperature=0.2,  # Lower temperature for more deterministic/less creative code
+        max_output_tokens=max_output_tokens,  # Latency grows with output length
+        # top_p=0.9,
+        # top_k=40
+    )
+
+
+def _get_response_cache_key(prompt: str, model_name: str) -> str:
+    # Hashed the same way as the generated test code cache; the bytes hashed are
+    # unchanged, so responses cached by earlier versions are still found.
+    return _make_cache_key(prompt, model_name)
+
+
+def _read_cached_response(cache_key: str) -> str | None:
+    """
+    Looks up a cached response, first in memory and then on disk.
+    """
+    cached_text = _response_memory_cache.get(cache_key)
+    if cached_text is not None:
+        return cached_text
+
+    cache_file_path = _get_cache_dir() / f"{cache_key}.txt"
+    try:
+        cached_text = cache_file_path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    except OSError as e:
         logger.info(
-            f"[AIClient] An unexpected error occurred while communicating with Vertex AI: {e}"
+            "[AIClient] Could not read cached response '%s': %s", cache_file_path, e
         )
+        return None
 
-    return None
+    _response_memory_cache[cache_key] = cached_text
+    return cached_text
+
+
+def _write_cached_response(cache_key: str, response_text: str):
+    """
+    Stores a response in memory and on disk.
+    """
+    _response_memory_cache[cache_key] = response_text
+    _write_text_atomically(_get_cache_dir() / f"{cache_key}.txt", response_text)
+
+
+def warm_up_vertex_ai(ai_config: AIConfig) -> None:
+    """
+    Initializes Vertex AI and loads the model once, before requests are sent in parallel,
+    so concurrent requests don't all pay for the cold start at the same time.
+    With DTT_WARM=1 set, a one-token request is also sent to open the connection.
+    Failures are only logged; the actual requests report them again.
+    """
+    try:
+        _initialize_vertex_ai(ai_config)
+        model = _get_model(ai_config.model_name, ai_config.project_id, ai_config.region)
+        if os.environ.get("DTT_WARM") == "1":
+            model.generate_content(
+                "ping",
+                generation_config=_get_generation_config(1),
+                safety_settings=SAFETY_SETTINGS,
+            )
+    except Exception as e:
+        logger.info("[AIClient] Vertex AI warm-up failed: %s", e)
 
 
 def _initialize_vertex_ai(ai_config: AIConfig):
@@ -119,16 +320,26 @@ def _initialize_vertex_ai(ai_config: AIConfig):
     Initializes Vertex AI SDK if not already done for the given config.
     """
     config_tuple = (ai_config.project_id, ai_config.region)
-    if config_tuple not in _vertex_ai_initialized_configs:
+    # Fast path once warm: a plain membership check, no locking.
+    if config_tuple in _vertex_ai_initialized_configs:
+        return
+
+    # Concurrent requests may all arrive here on a cold start; the lock makes sure
+    # vertexai.init runs only once per config.
+    with _vertex_ai_init_lock:
+        if config_tuple in _vertex_ai_initialized_configs:
+            return
         try:
             logger.info(
-                f"[AIClient] Initializing Vertex AI for project: {ai_config.project_id}, region: {ai_config.region}"
+                "[AIClient] Initializing Vertex AI for project: %s, region: %s",
+                ai_config.project_id,
+                ai_config.region,
             )
             vertexai.init(project=ai_config.project_id, location=ai_config.region)
             _vertex_ai_initialized_configs.add(config_tuple)
-            logger.info(f"[AIClient] Vertex AI initialized successfully.")
+            logger.info("[AIClient] Vertex AI initialized successfully.")
         except Exception as e:
-            logger.info(f"[AIClient] Critical error initializing Vertex AI: {e}")
+            logger.info("[AIClient] Critical error initializing Vertex AI: %s", e)
             # Depending on the application, you might want to raise this
             # or handle it in a way that subsequent calls will also fail clearly.
             raise  # Re-raise for now, so the caller knows init failed.
@@ -151,17 +362,22 @@ if __name__ == "__main__":
         )
     else:
         logger.info(
-            f"\n--- Testing AI Client with config: Project={test_ai_config.project_id}, Region={test_ai_config.region}, Model={test_ai_config.model_name} ---"
+            "\n--- Testing AI Client with config: Project=%s, Region=%s, Model=%s ---",
+            test_ai_config.project_id,
+            test_ai_config.region,
+            test_ai_config.model_name,
         )
 
         simple_prompt = "What is pytest in Python? Explain in one short sentence."
-        logger.info(f"\nTest 1: Simple explanation prompt: '{simple_prompt}'")
+        logger.info("\nTest 1: Simple explanation prompt: '%s'", simple_prompt)
         response_text = generate_text_from_prompt(simple_prompt, test_ai_config)
         if response_text:
             logger.info("\n[AIClient Test] Model Response:")
             logger.info(response_text)
         else:
-            logger.info("\n[AIClient Test] Failed to get a response for the simple prompt.")
+            logger.info(
+                "\n[AIClient Test] Failed to get a response for the simple prompt."
+            )
 
         logger.info("-" * 20)
 
@@ -170,7 +386,7 @@ if __name__ == "__main__":
             "Write a simple pytest function to test `def add(a, b): return a + b`.\n"
             "Provide only the Python code for the test."
         )
-        logger.info(f"\nTest 2: Code generation prompt: '{code_prompt[:50]}...'")
+        logger.info("\nTest 2: Code generation prompt: '%s...'", code_prompt[:50])
         code_response_text = generate_text_from_prompt(code_prompt, test_ai_config)
         if code_response_text:
             logger.info("\n[AIClient Test] Model Response (Code):")
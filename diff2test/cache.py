@@ -0,0 +1,77 @@
+# diff2test/cache.py
+import contextlib
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from diff2test.logger import logger
+
+# Cached data lives under this directory (overridable via DTT_CACHE_DIR).
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "diff2test"
+
+# Generated test code is kept in its own subdirectory, apart from the raw AI responses.
+_TEST_CODE_SUBDIR = "tests"
+
+
+def get_cache_dir() -> Path:
+    """
+    Returns the cache directory, honoring the DTT_CACHE_DIR environment variable.
+    """
+    return Path(os.environ.get("DTT_CACHE_DIR") or DEFAULT_CACHE_DIR)
+
+
+def make_key(*parts: str) -> str:
+    """
+    Returns the cache key for the given parts, e.g. a file path, its diff and a model name.
+    The key only depends on content, so changing any part simply misses the old entry.
+    Keys are only used to find entries, not to secure them, so a 128-bit BLAKE2b digest
+    is enough and is cheaper than SHA-256 on long prompts.
+    """
+    return hashlib.blake2b("\0".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def write_text_atomically(file_path: Path, text: str) -> None:
+    """
+    Writes a cache entry, creating its directory if needed.
+    The text is written to a temporary name first and then renamed, so concurrent
+    runs never see a partially written entry. Failures are only logged, since a cache
+    failure should never fail the generation itself.
+    """
+    tmp_file_name = None
+    try:
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=file_path.parent, suffix=".tmp", delete=False
+        ) as tmp_file:
+            tmp_file_name = tmp_file.name
+            tmp_file.write(text)
+        os.replace(tmp_file_name, file_path)
+    except OSError as e:
+        logger.info("[Cache] Could not write cache entry '%s': %s", file_path, e)
+        if tmp_file_name:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_file_name)
+
+
+def get(key: str) -> str | None:
+    """
+    Returns the test code cached under the key, or None if there is none.
+    """
+    cache_file_path = get_cache_dir() / _TEST_CODE_SUBDIR / f"{key}.py"
+    try:
+        return cache_file_path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.info(
+            "[Cache] Could not read cached test code '%s': %s", cache_file_path, e
+        )
+        return None
+
+
+def put(key: str, value: str) -> None:
+    """
+    Stores test code under the key.
+    """
+    write_text_atomically(get_cache_dir() / _TEST_CODE_SUBDIR / f"{key}.py", value)
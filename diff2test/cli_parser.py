@@ -60,7 +60,14 @@ def cli_current(
         typer.Option(
             "--interactive",
             "-i",
-            help="Run in interactive mode (default: False).",
+            help="Run in interactive mode: pick the files to process from a list (default: False).",
+        ),
+    ] = False,
+    interactive_legacy: Annotated[
+        bool,
+        typer.Option(
+            "--interactive-legacy",
+            help="Confirm each file one by one, showing its diff, and process files serially (default: False).",
         ),
     ] = False,
     target: Annotated[
@@ -71,11 +78,34 @@ def cli_current(
             help="Target file or directory to analyze (default: current working directory).",
         ),
     ] = None,  # Default to current working directory
+    stream: Annotated[
+        bool,
+        typer.Option(
+            "--stream",
+            "-s",
+            help="Stream the AI response to the console as it is generated (default: False).",
+        ),
+    ] = False,
+    no_cache: Annotated[
+        bool,
+        typer.Option(
+            "--no-cache",
+            help="Always call the AI model instead of reusing cached responses and generated tests (cache location: DTT_CACHE_DIR).",
+        ),
+    ] = False,
+    batch: Annotated[
+        bool,
+        typer.Option(
+            "--batch",
+            "-b",
+            help="Send several small diffs in a single AI request (ignored with --interactive-legacy).",
+        ),
+    ] = False,
 ):
     """
     dtt current: Analyzes changes from the last commit to the current working directory/staging area.
     """
-    logger.info(f"CLI: 'current' command invoked.")
+    logger.info("CLI: 'current' command invoked.")
     if not project_id or not region:
         logger.info(
             "Vertex AI Project ID and Region are required. "
@@ -87,15 +117,19 @@ def cli_current(
         # Consider adding: raise typer.Exit(code=1)
         return
 
-    logger.info(f"CLI: Project ID: {project_id}, Region: {region}")
-    result_message = process_current_changes(
+    logger.info("CLI: Project ID: %s, Region: %s", project_id, region)
+    process_current_changes(
         project_id=project_id,
         region=region,
         output_dir=output_dir,
         interactive=interactive,
         target=target,
+        stream=stream,
+        use_cache=not no_cache,
+        batch=batch,
+        interactive_legacy=interactive_legacy,
     )
-    logger.info(f"CLI: Task complete. Result:\n{result_message}")
+    logger.info("CLI: Task complete.")
 
 
 @app.command(
@@ -139,7 +173,14 @@ def cli_range(
         typer.Option(
             "--interactive",
             "-i",
-            help="Run in interactive mode (default: False).",
+            help="Run in interactive mode: pick the files to process from a list (default: False).",
+        ),
+    ] = False,
+    interactive_legacy: Annotated[
+        bool,
+        typer.Option(
+            "--interactive-legacy",
+            help="Confirm each file one by one, showing its diff, and process files serially (default: False).",
         ),
     ] = False,
     target: Annotated[
@@ -150,12 +191,35 @@ def cli_range(
             help="Target file or directory to analyze (default: current working directory).",
         ),
     ] = None,  # Default to current working directory
+    stream: Annotated[
+        bool,
+        typer.Option(
+            "--stream",
+            "-s",
+            help="Stream the AI response to the console as it is generated (default: False).",
+        ),
+    ] = False,
+    no_cache: Annotated[
+        bool,
+        typer.Option(
+            "--no-cache",
+            help="Always call the AI model instead of reusing cached responses and generated tests (cache location: DTT_CACHE_DIR).",
+        ),
+    ] = False,
+    batch: Annotated[
+        bool,
+        typer.Option(
+            "--batch",
+            "-b",
+            help="Send several small diffs in a single AI request (ignored with --interactive-legacy).",
+        ),
+    ] = False,
 ):
     """
     dtt range <COMMIT_A> [COMMIT_B]: Analyzes changes between commit_A and commit_B.
     If COMMIT_B is omitted, HEAD will be used.
     """
-    logger.info(f"CLI: 'range' command invoked. Range: {commit_a}..{commit_b}")
+    logger.info("CLI: 'range' command invoked. Range: %s..%s", commit_a, commit_b)
     if not project_id or not region:
         logger.info(
             "Vertex AI Project ID and Region are required. "
@@ -164,8 +228,8 @@ def cli_range(
         # Consider adding: raise typer.Exit(code=1)
         return
 
-    logger.info(f"CLI: Project ID: {project_id}, Region: {region}")
-    result_message = process_commit_range(
+    logger.info("CLI: Project ID: %s, Region: %s", project_id, region)
+    process_commit_range(
         commit_a,
         commit_b,
         project_id=project_id,
@@ -173,8 +237,12 @@ def cli_range(
         output_dir=output_dir,
         interactive=interactive,
         target=target,
+        stream=stream,
+        use_cache=not no_cache,
+        batch=batch,
+        interactive_legacy=interactive_legacy,
     )
-    logger.info(f"CLI: Task complete. Result:\n{result_message}")
+    logger.info("CLI: Task complete.")
 
 
 # Used for testing when running this file directly
@@ -1,12 +1,52 @@
-from pathlib import Path
+import errno
+import functools
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 from diff2test.logger import logger
 
+try:
+    import liburing  # Optional: batched file writes through io_uring (Linux only)
+except ImportError:
+    liburing = None
+
+# Write buffer for a single test file; large enough that a typical file is one write() call.
+WRITE_BUFFER_SIZE = 1 << 17  # 128 KiB
+
+# Payloads below this size are written with os.write directly, skipping the buffered-IO layer.
+DIRECT_WRITE_MAX_SIZE = 1 << 16  # 64 KiB
+_DIRECT_WRITE_FLAGS = (
+    os.O_WRONLY
+    | os.O_CREAT
+    | os.O_TRUNC
+    | getattr(os, "O_CLOEXEC", 0)
+    | getattr(os, "O_BINARY", 0)  # Windows only; keeps "\n" untranslated
+)
+# Permissions for new test files, before the umask is applied; the same as open() uses.
+_NEW_FILE_MODE = 0o666
+
+# The working directory is fixed for a run, so it is looked up once to make saved paths absolute.
+_CWD = os.getcwd()
+
+# Directories known to exist, so saving many files into the same directories skips
+# the mkdir/stat calls. Tests can reset it with _known_dirs.clear().
+_known_dirs: set[str] = set()
+
+# Upper bound for threads saving files at once when io_uring isn't used.
+# Writes release the GIL during the system call, so they overlap on the disk.
+MAX_PARALLEL_FILE_SAVES = 32
+
+# Files written per io_uring submission; each file takes three entries (open, write, close).
+IO_URING_BATCH_SIZE = 64
+_OPEN, _WRITE, _CLOSE = range(3)
+
 
 def save_test_code_to_file(
     original_file_path_str: str,
-    generated_test_code: str,
+    generated_test_code: str | bytes,
     base_output_dir_str: str = "tests",  # Base directory for all test files
+    buffer_size: int = WRITE_BUFFER_SIZE,
 ) -> str | None:
     """
     Saves the generated test code to a Python file.
@@ -18,53 +58,316 @@ def save_test_code_to_file(
 
     Args:
         original_file_path_str: The path string of the original source file.
-        generated_test_code: The string content of the test code to save.
+        generated_test_code: The test code to save, as a string or as UTF-8 encoded bytes.
         base_output_dir_str: The base directory where test files will be stored.
+        buffer_size: Size of the write buffer in bytes.
 
     Returns:
         The path string of the saved test file, or None if saving failed or test code is empty.
     """
     if not generated_test_code:
-        logger.info(
-            f"[FileWriter] No test code provided for '{original_file_path_str}'. Skipping file save."
+        logger.debug(
+            "[FileWriter] No test code provided for '%s'. Skipping file save.",
+            original_file_path_str,
         )
         return None
 
-    original_file_path = Path(original_file_path_str)
-    base_output_dir = Path(base_output_dir_str)
-
-    # Construct the test file name (e.g., "test_original_filename.py")
-    test_file_name = f"test_{original_file_path.name}"
-
-    # Determine the relative path from the original file's parent to maintain structure
-    # e.g., if original is "src/module/component.py", relative_parent_dir is "src/module"
-    relative_parent_dir = original_file_path.parent
-
-    # Construct the full output path for the test file
-    # e.g., tests/src/module/test_component.py
-    test_file_output_path = base_output_dir / relative_parent_dir / test_file_name
+    test_file_output_path, saved_path_str = _compute_output_path(
+        original_file_path_str, base_output_dir_str
+    )
 
     try:
         # Create the directory structure if it doesn't exist
-        test_file_output_path.parent.mkdir(parents=True, exist_ok=True)
+        _ensure_directory(os.path.dirname(test_file_output_path))
 
-        # Write the test code to the file
-        with open(test_file_output_path, "w", encoding="utf-8") as f:
-            f.write(generated_test_code)
+        # Write the test code to the file, encoded once
+        _write_payload(
+            test_file_output_path, _to_payload(generated_test_code), buffer_size
+        )
 
-        saved_path_str = str(test_file_output_path.resolve())
-        logger.info(f"[FileWriter] Successfully saved test code to: {saved_path_str}")
+        logger.debug("[FileWriter] Successfully saved test code to: %s", saved_path_str)
         return saved_path_str
     except IOError as e:
-        logger.info(f"[FileWriter] Error saving test file '{test_file_output_path}': {e}")
+        logger.info(
+            "[FileWriter] Error saving test file '%s': %s", test_file_output_path, e
+        )
     except Exception as e:  # Catch any other unexpected errors
         logger.info(
-            f"[FileWriter] An unexpected error occurred while saving '{test_file_output_path}': {e}"
+            "[FileWriter] An unexpected error occurred while saving '%s': %s",
+            test_file_output_path,
+            e,
         )
 
     return None
 
 
+def save_test_codes_batch(
+    items: list[tuple[str, str | bytes]],
+    base_output_dir_str: str = "tests",
+) -> list[str | None]:
+    """
+    Saves several generated test files at once.
+
+    Output paths are built the same way as in save_test_code_to_file.
+    If the optional liburing package is installed and the kernel supports it, the files
+    are opened, written and closed through one io_uring submission per batch instead of
+    three system calls per file. Otherwise each file is saved with save_test_code_to_file,
+    several at a time, after their directories have been created once each.
+
+    Args:
+        items: (original_file_path_str, generated_test_code) pairs; the code may be
+            a string or UTF-8 encoded bytes.
+        base_output_dir_str: The base directory where test files will be stored.
+
+    Returns:
+        The saved path string for each item, in order, or None where saving failed
+        or the test code was empty.
+    """
+    if len(items) < 2:
+        return [
+            save_test_code_to_file(original_file_path_str, code, base_output_dir_str)
+            for original_file_path_str, code in items
+        ]
+    if liburing is None:
+        return _save_files_in_parallel(items, base_output_dir_str)
+
+    saved_paths: list[str | None] = [None] * len(items)
+    pending = []
+    for i, (original_file_path_str, generated_test_code) in enumerate(items):
+        if not generated_test_code:
+            logger.debug(
+                "[FileWriter] No test code provided for '%s'. Skipping file save.",
+                original_file_path_str,
+            )
+            continue
+        output_path, absolute_path = _compute_output_path(
+            original_file_path_str, base_output_dir_str
+        )
+        pending.append(
+            (i, output_path, absolute_path, _to_payload(generated_test_code))
+        )
+
+    # Create all parent directories in one pass; files whose directory can't be
+    # created are reported right away and left out of the batch.
+    dir_errors: dict[str, OSError] = {}
+    for parent_dir in {os.path.dirname(entry[1]) for entry in pending}:
+        try:
+            _ensure_directory(parent_dir)
+        except OSError as e:
+            dir_errors[parent_dir] = e
+    writable = []
+    for entry in pending:
+        parent_dir = os.path.dirname(entry[1])
+        if parent_dir in dir_errors:
+            logger.info(
+                "[FileWriter] Error saving test file '%s': %s",
+                entry[1],
+                dir_errors[parent_dir],
+            )
+        else:
+            writable.append(entry)
+
+    for start in range(0, len(writable), IO_URING_BATCH_SIZE):
+        batch = writable[start : start + IO_URING_BATCH_SIZE]
+        try:
+            errors = _write_files_with_io_uring(
+                [(output_path, payload) for _, output_path, _, payload in batch]
+            )
+        except OSError as e:
+            # Old kernels or seccomp filters may not allow io_uring.
+            logger.info(
+                "[FileWriter] io_uring is unavailable (%s). Saving files one by one.",
+                e,
+            )
+            remaining = [i for i, *_ in writable[start:]]
+            fallback_paths = _save_files_in_parallel(
+                [items[i] for i in remaining], base_output_dir_str
+            )
+            for i, saved_path in zip(remaining, fallback_paths):
+                saved_paths[i] = saved_path
+            break
+
+        for (i, output_path, absolute_path, _), error in zip(batch, errors):
+            if error is None:
+                saved_paths[i] = absolute_path
+                logger.debug(
+                    "[FileWriter] Successfully saved test code to: %s", saved_paths[i]
+                )
+            else:
+                logger.info(
+                    "[FileWriter] Error saving test file '%s': %s", output_path, error
+                )
+
+    return saved_paths
+
+
+def _save_files_in_parallel(
+    items: list[tuple[str, str | bytes]], base_output_dir_str: str
+) -> list[str | None]:
+    """
+    Saves each item with save_test_code_to_file on a thread pool, keeping the input order.
+    Parent directories are created up front, once each, so the writers only find them
+    in _known_dirs; a directory that can't be created is reported by the item's own save.
+    """
+    parent_dirs = {
+        os.path.dirname(_compute_output_path(original_file_path_str, base_output_dir_str)[0])
+        for original_file_path_str, code in items
+        if code
+    }
+    for parent_dir in parent_dirs:
+        try:
+            _ensure_directory(parent_dir)
+        except OSError:
+            pass
+
+    max_workers = min(MAX_PARALLEL_FILE_SAVES, len(items))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(
+            executor.map(
+                lambda item: save_test_code_to_file(*item, base_output_dir_str), items
+            )
+        )
+
+
+def _to_payload(generated_test_code: str | bytes) -> bytes:
+    """
+    Returns the test code as UTF-8 bytes; code that is already encoded is written as is.
+    """
+    if isinstance(generated_test_code, bytes):
+        return generated_test_code
+    return generated_test_code.encode("utf-8")
+
+
+def _write_payload(file_path: str, payload: bytes, buffer_size: int) -> None:
+    """
+    Writes the payload to the file, replacing any existing content.
+    Typical test files are small, so they are written with os.write on a raw file
+    descriptor; larger payloads are flushed from a single BufferedWriter buffer.
+    """
+    if len(payload) >= DIRECT_WRITE_MAX_SIZE:
+        raw_file = io.FileIO(file_path, "w")
+        with io.BufferedWriter(raw_file, buffer_size=buffer_size) as f:
+            f.write(payload)
+        return
+
+    fd = os.open(file_path, _DIRECT_WRITE_FLAGS, _NEW_FILE_MODE)
+    try:
+        written = os.write(fd, payload)
+        if written < len(payload):
+            # Short writes are rare, so the memoryview is only made when one happens.
+            view = memoryview(payload)[written:]
+            while view:
+                view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
+
+
+def _ensure_directory(dir_path: str) -> None:
+    """
+    Creates the directory and its parents unless it is already known to exist.
+    """
+    if not dir_path or dir_path in _known_dirs:
+        return
+    os.makedirs(dir_path, exist_ok=True)
+    # Every ancestor exists now as well.
+    while dir_path and dir_path not in _known_dirs:
+        _known_dirs.add(dir_path)
+        parent_dir = os.path.dirname(dir_path)
+        if parent_dir == dir_path:  # Reached the root
+            break
+        dir_path = parent_dir
+
+
+@functools.lru_cache(maxsize=256)
+def _compute_output_path(
+    original_file_path_str: str, base_output_dir_str: str
+) -> tuple[str, str]:
+    """
+    Returns the path of the test file for the original file, as given and as an absolute path,
+    e.g. "tests/src/module/test_component.py" for "src/module/component.py".
+    Plain string operations are used instead of pathlib since this runs for every saved file.
+    """
+    # Split once into the parent directory, kept to maintain structure, and the file name
+    # e.g., "src/module/component.py" -> ("src/module", "component.py")
+    relative_parent_dir, original_file_name = os.path.split(original_file_path_str)
+
+    # Construct the test file name (e.g., "test_original_filename.py")
+    test_file_name = "test_" + original_file_name
+
+    # Construct the full output path for the test file
+    # e.g., tests/src/module/test_component.py
+    output_path = os.path.join(base_output_dir_str, relative_parent_dir, test_file_name)
+    if os.path.isabs(output_path):
+        return output_path, os.path.normpath(output_path)
+    return output_path, os.path.normpath(os.path.join(_CWD, output_path))
+
+
+def _write_files_with_io_uring(files: list[tuple[str, bytes]]) -> list[OSError | None]:
+    """
+    Writes the files with linked open -> write -> close operations submitted in one go.
+    Each file uses its own registered file slot, so no file descriptors are returned to Python.
+
+    Returns:
+        The error for each file, or None if it was written completely.
+    Raises:
+        OSError if the ring can't be set up (e.g. the kernel doesn't support it).
+    """
+    ring = liburing.Ring()
+    cqe = liburing.Cqe()
+    entry_count = 3 * len(files)
+    liburing.io_uring_queue_init(entry_count, ring)
+    try:
+        liburing.io_uring_register_files_sparse(ring, len(files))
+        for slot, (path, payload) in enumerate(files):
+            sqe = liburing.io_uring_get_sqe(ring)
+            liburing.io_uring_prep_open_direct(
+                sqe,
+                path,
+                liburing.O_WRONLY | liburing.O_CREAT | liburing.O_TRUNC,
+                slot,
+                _NEW_FILE_MODE,
+            )
+            # A failed open or write cancels the rest of the chain for this file.
+            liburing.io_uring_sqe_set_flags(sqe, liburing.IOSQE_IO_LINK)
+            liburing.io_uring_sqe_set_data64(sqe, 3 * slot + _OPEN)
+
+            sqe = liburing.io_uring_get_sqe(ring)
+            liburing.io_uring_prep_write(sqe, slot, payload, 0)
+            liburing.io_uring_sqe_set_flags(
+                sqe, liburing.IOSQE_IO_LINK | liburing.IOSQE_FIXED_FILE
+            )
+            liburing.io_uring_sqe_set_data64(sqe, 3 * slot + _WRITE)
+
+            sqe = liburing.io_uring_get_sqe(ring)
+            liburing.io_uring_prep_close_direct(sqe, slot)
+            liburing.io_uring_sqe_set_data64(sqe, 3 * slot + _CLOSE)
+
+        liburing.io_uring_submit_and_wait(ring, entry_count)
+
+        errors: list[OSError | None] = [None] * len(files)
+        for _ in range(entry_count):
+            liburing.io_uring_wait_cqe(ring, cqe)
+            entry = cqe[0]
+            slot, operation = divmod(liburing.io_uring_cqe_get_data64(entry), 3)
+            try:
+                result = entry.res
+                if result is not None and result < 0:  # -errno of a failed operation
+                    raise OSError(-result, os.strerror(-result))
+                if operation == _WRITE and result != len(files[slot][1]):
+                    raise OSError(
+                        f"Short write ({result} of {len(files[slot][1])} bytes)"
+                    )
+            except OSError as e:
+                # A failed open or write cancels the rest of the chain; report the
+                # failure itself rather than the cancellations it caused.
+                if errors[slot] is None or errors[slot].errno == errno.ECANCELED:
+                    errors[slot] = e
+            liburing.io_uring_cqe_seen(ring, entry)
+        return errors
+    finally:
+        liburing.io_uring_queue_exit(ring)
+
+
 # --- Example Usage (for testing this module directly) ---
 if __name__ == "__main__":
     logger.info("--- Testing File Writer ---")
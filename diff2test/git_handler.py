@@ -1,182 +1,325 @@
+import functools
+from dataclasses import dataclass
 import glob
+import shutil
 import subprocess
-from typing import List, Optional
+import tempfile
+from typing import Iterable, Iterator, List, Optional, Tuple
 import os
+import re
 
 from diff2test.logger import logger
 from diff2test.models import DiffInfo
 
+# Read buffer for git's stdout; diff output is consumed in chunks as git produces it.
+GIT_OUTPUT_BUFFER_SIZE = 1 << 20
+# The git executable, looked up on PATH once instead of on every process start.
+# Falls back to the bare name, so a missing git still fails when a command is run.
+_GIT = shutil.which("git") or "git"
+# Lines of unchanged context around each hunk. Context is shipped verbatim into the
+# prompt, so none is requested by default; only the changed lines are sent.
+DEFAULT_CONTEXT_LINES = 0
+# Keeps git from paging, coloring or running external diff drivers,
+# so the output is always the plain unified diff the parser expects.
+_GIT_DIFF_BASE = (_GIT, "--no-pager", "diff", "--no-color", "--no-ext-diff")
+# Pathspecs used without a target: every Python file except test files.
+_DEFAULT_PATHSPECS: Tuple[str, ...] = ("**/*.py", ":(exclude)**/test_*.py")
+# The first line of each file's diff in a patch.
+_DIFF_HEADER_RE = re.compile(rb"^diff --git ", re.MULTILINE)
 
-def get_diff_between_commits(commit_a: str, commit_b: str, target: Optional[str]) -> List[DiffInfo]:
+
+@dataclass(slots=True, frozen=True)
+class _RawRecord:
+    """
+    One file of git's raw diff output (":<old mode> <new mode> <old sha> <new sha> <status>").
+    old_path and new_path only differ for renames and copies.
+    """
+
+    status: str
+    old_mode: str
+    new_mode: str
+    old_path: bytes
+    new_path: bytes
+
+
+def get_diff_between_commits(
+    commit_a: str,
+    commit_b: str,
+    target: Optional[str],
+    context_lines: int = DEFAULT_CONTEXT_LINES,
+) -> Iterator[DiffInfo]:
     """
     Gets the diff for Python files between two specified commit hashes.
+    One `git diff -z --patch-with-raw` process produces the diff of every file,
+    which is parsed while it is being produced, one file at a time.
+    Renames are detected over the whole pathspec, so a renamed file is reported
+    with only its changed lines. Deleted files are skipped, since there is no code left to test.
     """
     logger.info(
-        f"[GitHandler] Getting diff between {commit_a} and {commit_b} for Python files..."
+        "[GitHandler] Getting diff between %s and %s for Python files...",
+        commit_a,
+        commit_b,
     )
-    git_command_base = ["git", "diff", "--unified=3", commit_a, commit_b]
-    
+    git_command = [
+        *_GIT_DIFF_BASE,
+        "-z",
+        "--patch-with-raw",
+        "-M",
+        "--diff-filter=AMRT",
+        f"--unified={context_lines}",
+        commit_a,
+        commit_b,
+    ]
+
     effective_pathspecs = _get_effective_pathspecs(target)
-    git_command = git_command_base
     if effective_pathspecs:
-        git_command.extend(["--"] + effective_pathspecs)
+        git_command.extend(["--", *effective_pathspecs])
 
-    raw_diff = _run_git_command(git_command)
-    return _parse_diff_output(raw_diff)
+    return _parse_diff_stream(_run_git_command(git_command))
 
 
-def get_current_changes(target: Optional[str]) -> List[DiffInfo]:
+def get_current_changes(
+    target: Optional[str], context_lines: int = DEFAULT_CONTEXT_LINES
+) -> Iterator[DiffInfo]:
     """
     Gets the diff for Python files from HEAD to the current working directory/staging area.
     This shows all uncommitted changes (staged and unstaged combined) for Python files.
+    Git's output is parsed while it is being produced, one file at a time.
+    The NUL-delimited raw records in front of the patch give each file's exact path,
+    so paths git would quote in the patch headers (e.g. non-ASCII names) are kept too.
     """
     logger.info(
-        f"[GitHandler] Getting current uncommitted changes (HEAD vs. working tree/index) for Python files..."
+        "[GitHandler] Getting current uncommitted changes (HEAD vs. working tree/index) for Python files..."
     )
-    git_command_base = ["git", "diff", "--unified=3", "HEAD"]
+    git_command_base = [
+        *_GIT_DIFF_BASE,
+        "-z",
+        "--patch-with-raw",
+        f"--unified={context_lines}",
+        "HEAD",
+    ]
     
     effective_pathspecs = _get_effective_pathspecs(target)
     git_command = git_command_base
     if effective_pathspecs:
-        git_command.extend(["--"] + effective_pathspecs)
+        git_command.extend(["--", *effective_pathspecs])
 
-    raw_diff = _run_git_command(git_command)
-    return _parse_diff_output(raw_diff)
+    return _parse_diff_stream(_run_git_command(git_command))
 
 
-def _run_git_command(command: List[str]) -> str:
+def _run_git_command(command: List[str]) -> Iterator[bytes]:
     """
-    Runs a Git command and returns its standard output.
-    Raises CalledProcessError if the command fails.
+    Runs a Git command and yields its standard output in chunks of bytes, as it arrives.
+    Raises CalledProcessError, after the output has been consumed, if the command fails.
     """
-    try:
-        # Ensure the command targets the current working directory explicitly if needed,
-        # or rely on the script being run from the repo root.
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=True,  # Raises CalledProcessError for non-zero exit codes
-            encoding="utf-8",  # Specify encoding for consistency
-        )
-        return result.stdout
-    except FileNotFoundError:
-        # This happens if 'git' command is not found
-        logger.info("Error: 'git' command not found. Is Git installed and in your PATH?")
-        raise
-    except subprocess.CalledProcessError as e:
-        logger.info(f"Error executing Git command: {' '.join(command)}")
-        logger.info(f"Return code: {e.returncode}")
-        logger.info(f"Stderr: {e.stderr.strip()}")
-        raise
-
-
-def _parse_diff_output(raw_diff_output: str) -> List[DiffInfo]:
-    """
-    Parses the raw output of 'git diff' into a list of DiffInfo objects.
-    This parser assumes the unified diff format.
-    """
-    diffs_info: List[DiffInfo] = []
-    if not raw_diff_output.strip():
-        return diffs_info
-
-    # Each file's diff in unified format typically starts with "diff --git a/..."
-    # We add a newline at the beginning to make the split consistent
-    # in case the raw_diff_output doesn't start with one.
-    # Then split by this delimiter. The first element of the split will be empty.
-    individual_file_diffs = ("\n" + raw_diff_output.strip()).split("\ndiff --git a/")[
-        1:
-    ]
-
-    for file_diff_section in individual_file_diffs:
-        lines = file_diff_section.strip().splitlines()
-        if not lines:
-            continue
-
-        # The first line of file_diff_section (now lines[0]) is like "old_path b/new_path"
-        # We need to reconstruct the full diff header for the content passed to AI
-        full_diff_content_for_ai = "diff --git a/" + file_diff_section.strip()
-
-        file_path_a = None
-        file_path_b = None
-
-        # Try to find file paths from '--- a/...' and '+++ b/...' lines
-        for line_content in lines:
-            if line_content.startswith("--- a/"):
-                file_path_a = line_content[len("--- a/") :].strip()
-            elif line_content.startswith("+++ b/"):
-                file_path_b = line_content[len("+++ b/") :].strip()
-
-            # Optimization: if both found relatively early, can break.
-            # However, some diffs (e.g. binary) might not have these lines in the same way,
-            # but our '*.py' filter should mostly give us text files.
-            if file_path_a is not None and file_path_b is not None:
-                break
-
-        # Determine the effective file path.
-        # For new files, path_a is /dev/null. For deleted files, path_b is /dev/null.
-        # We prefer path_b if it's a valid path, otherwise path_a.
-        # The '-- '*.py'' filter in the git command itself helps ensure we only get Python files.
-        effective_path = None
-        if file_path_b and file_path_b != "/dev/null":
-            effective_path = file_path_b
-        elif file_path_a and file_path_a != "/dev/null":  # Covers deleted files
-            effective_path = file_path_a
-
-        if effective_path:  # The '*.py' filter is in the git command, so we assume it's a .py file
-            diffs_info.append(
-                DiffInfo(
-                    file_path=effective_path, diff_content=full_diff_content_for_ai
-                )
+    # stderr goes to a temporary file, so a chatty git can't block on a full pipe
+    # while we are still reading stdout.
+    with tempfile.TemporaryFile() as stderr_file:
+        try:
+            # Ensure the command targets the current working directory explicitly if needed,
+            # or rely on the script being run from the repo root.
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=stderr_file,
+                bufsize=GIT_OUTPUT_BUFFER_SIZE,
             )
-        # else:
-        # Could log if a diff section couldn't be parsed for a file path,
-        # but the git filter should prevent non-.py files from appearing.
+        except FileNotFoundError:
+            # This happens if 'git' command is not found
+            logger.info("Error: 'git' command not found. Is Git installed and in your PATH?")
+            raise
+
+        with process:
+            # read1 returns whatever is buffered (up to the buffer size) in one call,
+            # so the output isn't split into lines in Python.
+            yield from iter(lambda: process.stdout.read1(GIT_OUTPUT_BUFFER_SIZE), b"")
+            returncode = process.wait()
+
+        if returncode != 0:
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode("utf-8", "replace")
+            logger.info("Error executing Git command: %s", " ".join(command))
+            logger.info("Return code: %s", returncode)
+            logger.info("Stderr: %s", stderr.strip())
+            raise subprocess.CalledProcessError(returncode, command, stderr=stderr)
+
+
+def _parse_diff_stream(chunks: Iterable[bytes]) -> Iterator[DiffInfo]:
+    """
+    Parses the output of 'git diff -z --patch-with-raw' into DiffInfo objects,
+    one file at a time, while git is still producing it.
+
+    The output starts with one NUL-delimited raw record per file, followed by the
+    unified diff of each file in the same order, each starting with "diff --git ".
+    The records are read first, so every section only needs to be matched to its
+    path by position. A typechange (e.g. a symlink replaced by a regular file) has one
+    record but two sections, a deletion and an addition, under the same header line;
+    consecutive sections with the same header are therefore merged into one file's diff.
+    Section boundaries are found with a compiled regex over whole chunks of output,
+    so no Python code runs per line; a file's bytes are joined and decoded once,
+    when its diff is complete.
+    """
+    chunks = iter(chunks)
+    records, patch_start = _read_raw_records(chunks)
+    if not records:
+        return
+    # The raw record holds the new path for renames and the old one for deleted files.
+    file_paths = [record.new_path for record in records]
+
+    # A bytearray grows in place, so a large file's diff isn't copied once per chunk.
+    pending = bytearray(patch_start)
+
+    record_index = -1
+    record_header = None  # The "diff --git" line of the record being collected
+    record_diff = bytearray()
+    started = False  # Whether pending starts with the header of the current section
+    search_from = 0
+    while True:
+        header_starts = [
+            match.start() for match in _DIFF_HEADER_RE.finditer(pending, search_from)
+        ]
+        if header_starts:
+            if not started:
+                # Anything before the first section isn't part of a file's diff.
+                del pending[: header_starts[0]]
+                header_starts = [start - header_starts[0] for start in header_starts[1:]]
+                started = True
+            section_start = 0
+            for header_start in header_starts:
+                section = pending[section_start:header_start]
+                section_header = section[: section.find(b"\n")]
+                if section_header != record_header:
+                    diff_info = _finalize_diff_section(record_diff, file_paths, record_index)
+                    if diff_info:
+                        yield diff_info
+                    record_index += 1
+                    record_header = section_header
+                    record_diff = section
+                else:
+                    record_diff += section
+                section_start = header_start
+            del pending[:section_start]
 
-    return diffs_info
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        # A header may have been cut off at the end of the previous chunk.
+        search_from = max(1 if started else 0, len(pending) - len(b"diff --git "))
+        pending += chunk
+
+    if started:
+        if pending[: pending.find(b"\n")] == record_header:
+            record_diff += pending
+        else:
+            diff_info = _finalize_diff_section(record_diff, file_paths, record_index)
+            if diff_info:
+                yield diff_info
+            record_index += 1
+            record_diff = pending
+        diff_info = _finalize_diff_section(record_diff, file_paths, record_index)
+        if diff_info:
+            yield diff_info
+
+
+def _read_raw_records(chunks: Iterator[bytes]) -> Tuple[List[_RawRecord], bytes]:
+    """
+    Reads the raw records that end with an empty field before the patch.
+
+    Returns:
+        The record of each file, in patch order, and the part of the output
+        read after the records (the start of the patch).
+    """
+    # Grown in place, so many small chunks of records aren't copied again each time.
+    raw_output = bytearray()
+    patch_start = b""
+    for chunk in chunks:
+        search_from = max(len(raw_output) - 1, 0)
+        raw_output += chunk
+        end = raw_output.find(b"\x00\x00", search_from)
+        if end != -1:
+            patch_start = bytes(raw_output[end + 2 :])
+            del raw_output[end + 1 :]
+            break
+
+    records = list(_parse_raw_records(iter(bytes(raw_output).split(b"\x00"))))
+    return records, patch_start
+
+
+def _parse_raw_records(fields: Iterator[bytes]) -> Iterator[_RawRecord]:
+    """
+    Parses NUL-delimited raw records (":<modes> <shas> <status>\0<path>\0", with a second
+    path for renames and copies), stopping at the first field that doesn't start a record.
+    """
+    for header in fields:
+        if not header.startswith(b":"):
+            return
+        old_mode, new_mode, _, _, status = header[1:].decode("ascii").split(" ")
+        old_path = next(fields, None)
+        if old_path is None:
+            return
+        new_path = old_path
+        if status[:1] in ("R", "C"):  # Followed by the old and the new path
+            new_path = next(fields, None)
+            if new_path is None:
+                return
+        yield _RawRecord(status, old_mode, new_mode, old_path, new_path)
 
 
-def _get_effective_pathspecs(target: Optional[str]) -> List[str]:
+def _finalize_diff_section(
+    section: bytes | bytearray, file_paths: List[bytes], record_index: int
+) -> Optional[DiffInfo]:
+    """
+    Builds the DiffInfo for one file's diff, or None if it has no hunks.
+    """
+    # Binary, mode-only or pure-rename diffs have no hunks and are left out.
+    # The '*.py' filter in the git command itself ensures we only get Python files.
+    if b"\n@@" not in section or not 0 <= record_index < len(file_paths):
+        return None
+
+    return DiffInfo(
+        file_path=file_paths[record_index].decode("utf-8", "replace"),
+        # Trailing whitespace is trimmed while still in bytes, so decoding is the only
+        # pass that produces a new string.
+        diff_content=section.rstrip().decode("utf-8", "replace"),
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _get_effective_pathspecs(target: Optional[str]) -> Tuple[str, ...]:
     """
     Constructs pathspecs for git diff.
+    The result only depends on target, so it is cached and returned as an immutable tuple.
     If target is provided, patterns apply within that target (AND logic).
     Otherwise, patterns apply globally.
     """
+    if not target or not target.rstrip("/").strip():
+        # No target specified (or effectively empty, e.g. "/"), use global recursive patterns.
+        return _DEFAULT_PATHSPECS
+
     pathspecs = []
 
     # General patterns for Python files and excluding test files
     python_files_glob = "**/*.py"  # Recursive from the context
     exclude_tests_glob = "**/test_*.py"  # Recursive from the context, matches test_*.py
 
-    if target:
-        clean_target = target.rstrip('/')  # Remove trailing slash for consistency
-
-        # Heuristic: if target itself ends with .py, treat it as a specific file target.
-        # Otherwise, treat it as a directory/prefix for other patterns.
-        if clean_target.endswith(".py"):
-            # Target is a specific Python file.
-            # Add the file itself as a pathspec.
-            pathspecs.append(clean_target)
-            # Add the general exclusion. If clean_target is a test file, it will be excluded by Git.
-            pathspecs.append(f":(exclude){exclude_tests_glob}")
-        else:
-            # Target is a directory or a non-Python file.
-            # If clean_target is empty (e.g., target was "/" or just spaces), default to global.
-            if not clean_target.strip():  # Check if effectively empty
-                pathspecs.append(python_files_glob)
-                pathspecs.append(f":(exclude){exclude_tests_glob}")
-            else:
-                # Target is treated as a directory prefix.
-                # Python files within this directory:
-                pathspecs.append(f"{clean_target}/{python_files_glob}")
-                # Exclude test files within this directory:
-                pathspecs.append(f":(exclude){clean_target}/{exclude_tests_glob}")
-    else:
-        # No target specified, use global recursive patterns.
-        pathspecs.append(python_files_glob)
+    clean_target = target.rstrip('/')  # Remove trailing slash for consistency
+
+    # Heuristic: if target itself ends with .py, treat it as a specific file target.
+    # Otherwise, treat it as a directory/prefix for other patterns.
+    if clean_target.endswith(".py"):
+        # Target is a specific Python file.
+        # Add the file itself as a pathspec.
+        pathspecs.append(clean_target)
+        # Add the general exclusion. If clean_target is a test file, it will be excluded by Git.
         pathspecs.append(f":(exclude){exclude_tests_glob}")
+    else:
+        # Target is treated as a directory prefix.
+        # Python files within this directory:
+        pathspecs.append(f"{clean_target}/{python_files_glob}")
+        # Exclude test files within this directory:
+        pathspecs.append(f":(exclude){clean_target}/{exclude_tests_glob}")
 
-    return pathspecs
+    return tuple(pathspecs)
 
 
 # Example usage (for testing this module directly):
@@ -190,7 +333,7 @@ if __name__ == "__main__":
     # Test 1: Current Changes
     logger.info("\nTesting get_current_changes():")
     try:
-        current_diffs = get_current_changes()
+        current_diffs = list(get_current_changes(target=None))
         if current_diffs:
             for diff_info in current_diffs:
                 logger.info(f"\nFile: {diff_info.file_path}")
@@ -206,7 +349,7 @@ if __name__ == "__main__":
     # commit_b_hash = "HEAD"
     # logger.info(f"\nTesting get_diff_between_commits({commit_a_hash}, {commit_b_hash}):")
     # try:
-    #     commit_diffs = get_diff_between_commits(commit_a_hash, commit_b_hash)
+    #     commit_diffs = list(get_diff_between_commits(commit_a_hash, commit_b_hash, target=None))
     #     if commit_diffs:
     #         for diff_info in commit_diffs:
     #             logger.info(f"\nFile: {diff_info.file_path}")
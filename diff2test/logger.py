@@ -1,18 +1,62 @@
 import logging
-from rich.logging import RichHandler
+import os
+import sys
+
+# Environment variable to change the log level, e.g. DIFF2TEST_LOG=DEBUG.
+LOG_LEVEL_ENV_VAR = "DIFF2TEST_LOG"
+DEFAULT_LOG_LEVEL = logging.INFO
+
+
+def _get_log_level() -> int:
+    """
+    Returns the level named by DIFF2TEST_LOG, or INFO if it is unset or unknown.
+    """
+    level_name = os.environ.get(LOG_LEVEL_ENV_VAR, "").strip().upper()
+    level = logging.getLevelName(level_name) if level_name else DEFAULT_LOG_LEVEL
+    return level if isinstance(level, int) else DEFAULT_LOG_LEVEL
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """
+    A StreamHandler that always writes to the current sys.stdout,
+    so it follows redirections the same way Rich's console does.
+    """
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def _create_handler() -> logging.Handler:
+    """
+    Returns a RichHandler for interactive terminals, or a plain StreamHandler when
+    output is piped or redirected (e.g. CI), where Rich's per-record rendering is wasted.
+    Both write to stdout, where RichHandler's console writes by default.
+    """
+    if sys.stdout.isatty():
+        # Imported here so piped runs never load Rich's console machinery.
+        from rich.logging import RichHandler
+
+        handler = RichHandler(
+            show_path=False,
+            show_level=True,
+            show_time=False,
+        )
+    else:
+        handler = _StdoutHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
 
 
 logger = logging.getLogger("diff2test")
 
-logger.setLevel(logging.DEBUG)
+logger.setLevel(_get_log_level())
 
 if not logger.handlers:
-    rich_handler = RichHandler(
-        show_path=False,
-        show_level=True,
-        show_time=False,
-    )
-    rich_handler.setFormatter(logging.Formatter("%(message)s"))
-    logger.addHandler(rich_handler)
+    logger.addHandler(_create_handler())
 
 logger.propagate = False
@@ -2,10 +2,11 @@
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class DiffInfo:
     """
     Holds information about a single file's diff.
+    Instances are immutable and hashable, so they can be used as cache keys.
     """
 
     file_path: str
@@ -15,8 +16,13 @@ class DiffInfo:
     # commit_hash: str
 
 
-@dataclass
+# Immutable as well; use dataclasses.replace to derive a config with other settings.
+@dataclass(slots=True, frozen=True)
 class AIConfig:
     project_id: str
     region: str
     model_name: str = "gemini-2.0-flash"  # You can change this default
+    stream: bool = False  # Print the response incrementally as chunks arrive
+    use_cache: bool = False  # Reuse cached responses for identical prompts
+    max_output_tokens: int = 2048  # Upper bound for the length of the generated tests
+    max_retries: int = 4  # Retries for transient API errors (e.g. quota exhausted)
@@ -1,38 +1,35 @@
+import functools
+import string
+from typing import List, Tuple
+
 from diff2test.logger import logger
 from diff2test.models import DiffInfo
 
 DEFAULT_TEST_FRAMEWORK = "pytest"
 
+# Delimiters the model is asked to wrap each file's tests in for batched prompts.
+# response_parser.extract_python_code_per_file relies on the same markers.
+BATCH_FILE_START_MARKER = "<<<FILE {file_path}>>>"
+BATCH_FILE_END_MARKER = "<<<END>>>"
 
-def create_test_prompt_for_diff(
-    diff_info: DiffInfo, test_framework: str = DEFAULT_TEST_FRAMEWORK
-) -> str:
-    """
-    Creates a prompt for an AI model to generate unit tests based on a code diff.
-
-    Args:
-        diff_info: A DiffInfo object containing the file path and diff content.
-        test_framework: The testing framework to be used (e.g., "pytest", "unittest").
-
-    Returns:
-        A string representing the prompt to be sent to the AI model.
-    """
-
-    prompt_lines = [
-        f"You are an expert AI programming assistant specializing in Python and the {test_framework} testing framework.",
+# The static part of the single-file prompt. The framework is filled in once per
+# framework (see _get_prompt_fragments); the file path and diff are joined in per call.
+_PROMPT_TEMPLATE = "\n".join(
+    [
+        "You are an expert AI programming assistant specializing in Python and the $test_framework testing framework.",
         "Your task is to generate unit tests for the provided code changes.",
         "If the code changes are not sufficient to write tests, respond with 'NO_TESTS_NEEDED'.",
         "",
-        f"The code changes are in the file: `{diff_info.file_path}`",
+        "The code changes are in the file: `$file_path`",
         "",
         "Please analyze the following diff carefully:",
         "```diff",
-        diff_info.diff_content,
+        "$diff_content",
         "```",
         "",
-        f"Based on these changes, please write concise and effective unit tests using {test_framework}.",
+        "Based on these changes, please write concise and effective unit tests using $test_framework.",
         "The tests should specifically target the modified or newly introduced behavior.",
-        f"Follow standard testing conventions and best practices for {test_framework}.",
+        "Follow standard testing conventions and best practices for $test_framework.",
         "",
         "Instructions for your response:",
         "- Provide only the Python code for the tests.",
@@ -43,6 +40,104 @@ def create_test_prompt_for_diff(
         # "- If applicable, suggest tests for both positive and negative scenarios."
         # "- Ensure tests are independent and can be run (idempotent if possible)."
     ]
+)
+
+# The template around the two per-call values: before the file path, between it and
+# the diff, and after the diff. Only $test_framework is left in each fragment.
+_before_file_path, _after_file_path = _PROMPT_TEMPLATE.split("$file_path")
+_PROMPT_FRAGMENTS = tuple(
+    string.Template(fragment)
+    for fragment in (_before_file_path, *_after_file_path.split("$diff_content"))
+)
+del _before_file_path, _after_file_path
+
+
+def create_test_prompt_for_diff(
+    diff_info: DiffInfo, test_framework: str = DEFAULT_TEST_FRAMEWORK
+) -> str:
+    """
+    Creates a prompt for an AI model to generate unit tests based on a code diff.
+
+    Args:
+        diff_info: A DiffInfo object containing the file path and diff content.
+        test_framework: The testing framework to be used (e.g., "pytest", "unittest").
+
+    Returns:
+        A string representing the prompt to be sent to the AI model.
+    """
+    return _build_prompt(diff_info.file_path, diff_info.diff_content, test_framework)
+
+
+@functools.lru_cache(maxsize=1024)
+def _build_prompt(file_path: str, diff_content: str, test_framework: str) -> str:
+    # Cached by the diff text itself, so re-processing the same diff within a session
+    # returns the already assembled prompt. The bound keeps memory in check on large
+    # changesets, where each entry holds a full prompt.
+    # One join of the five pieces, instead of a template substitution scanning the
+    # whole prompt for placeholders on every call.
+    before_file_path, before_diff, after_diff = _get_prompt_fragments(test_framework)
+    return "".join((before_file_path, file_path, before_diff, diff_content, after_diff))
+
+
+@functools.lru_cache(maxsize=4)
+def _get_prompt_fragments(test_framework: str) -> Tuple[str, str, str]:
+    """
+    Returns the static prompt fragments with the test framework already filled in.
+    Nearly every run uses a single framework, so all prompts share one set of fragments.
+    """
+    before_file_path, before_diff, after_diff = (
+        fragment.substitute(test_framework=test_framework)
+        for fragment in _PROMPT_FRAGMENTS
+    )
+    return before_file_path, before_diff, after_diff
+
+
+def create_batch_test_prompt_for_diffs(
+    diff_infos: List[DiffInfo], test_framework: str = DEFAULT_TEST_FRAMEWORK
+) -> str:
+    """
+    Creates a single prompt asking the AI model to generate unit tests for several diffs at once.
+
+    The model is instructed to emit the tests of each file between
+    BATCH_FILE_START_MARKER and BATCH_FILE_END_MARKER, so the response can be split per file.
+
+    Args:
+        diff_infos: The DiffInfo objects to include in the prompt.
+        test_framework: The testing framework to be used (e.g., "pytest", "unittest").
+
+    Returns:
+        A string representing the prompt to be sent to the AI model.
+    """
+    prompt_lines = [
+        f"You are an expert AI programming assistant specializing in Python and the {test_framework} testing framework.",
+        "Your task is to generate unit tests for the provided code changes in several files.",
+        "",
+        "Please analyze the following diffs carefully:",
+    ]
+    for diff_info in diff_infos:
+        prompt_lines.extend(
+            [
+                f"=== FILE: {diff_info.file_path} ===",
+                "```diff",
+                diff_info.diff_content,
+                "```",
+            ]
+        )
+    prompt_lines.extend(
+        [
+            "",
+            f"Based on these changes, please write concise and effective unit tests using {test_framework}.",
+            "The tests should specifically target the modified or newly introduced behavior.",
+            f"Follow standard testing conventions and best practices for {test_framework}.",
+            "",
+            "Instructions for your response:",
+            "- Write a separate block for every file listed above, in the same order.",
+            f"- Start each block with a line `{BATCH_FILE_START_MARKER}` and end it with a line `{BATCH_FILE_END_MARKER}`.",
+            "- Inside each block, provide only the Python code for the tests of that file.",
+            "- If the code changes of a file are not sufficient to write tests, put 'NO_TESTS_NEEDED' in its block.",
+            "- Do not include any explanatory text, introductions, or summaries outside the blocks.",
+        ]
+    )
 
     return "\n".join(prompt_lines)
 
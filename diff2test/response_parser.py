@@ -1,8 +1,19 @@
 # diff2test/response_parser.py
+import logging
 import re
 
 from diff2test.logger import logger
 
+# Per-file blocks of a batched response, see prompt_builder.BATCH_FILE_START_MARKER.
+_BATCH_FILE_BLOCK_RE = re.compile(r"<<<FILE\s+(.+?)>>>[ \t]*\n?(.*?)<<<END>>>", re.DOTALL)
+
+# Language tags accepted after an opening fence (case-insensitive), longest first.
+_FENCE_LANGUAGES = ("python", "py")
+
+# Python keywords that suggest an unfenced response is code, found in a single scan.
+# Word boundaries keep prose such as "reimport" or "assertion" from matching.
+_FALLBACK_CODE_RE = re.compile(r"\b(?:def|import|class|assert)\b|@")
+
 
 def extract_python_code_from_response(ai_response: str) -> str | None:
     """
@@ -20,41 +31,39 @@ def extract_python_code_from_response(ai_response: str) -> str | None:
         The extracted Python code as a string, or None if no suitable code is found.
     """
     if not ai_response:
-        logger.info("[ResponseParser] Received empty AI response.")
+        logger.debug("[ResponseParser] Received empty AI response.")
         return None
 
     # Check for "NO_TEST_NEEDED" keyword first.
-    if "NO_TESTS_NEEDED" in ai_response.strip():
-        logger.info("[ResponseParser] AI response indicates no tests needed.")
+    if "NO_TESTS_NEEDED" in ai_response:
+        logger.debug("[ResponseParser] AI response indicates no tests needed.")
         return "NO_TESTS_NEEDED"
 
-    # Regex to find Python code blocks fenced by triple backticks.
-    # - Supports optional language specifiers like 'python' or 'py'.
-    # - re.DOTALL allows '.' to match newlines, capturing multiline code blocks.
-    # - re.IGNORECASE makes 'python' matching case-insensitive.
-    # - (.*?) is a non-greedy capture of the content inside the fences.
-    code_block_pattern = re.compile(
-        r"```(?:python|py)?\s*\n(.*?)\n```", re.DOTALL | re.IGNORECASE
-    )
-
-    match = code_block_pattern.search(ai_response)
-    extracted_code = None
-
-    if match:
-        extracted_code = match.group(1).strip()
-        logger.info(
-            f"[ResponseParser] Extracted fenced code block (length: {len(extracted_code)})."
-        )
+    # Without any fence there is nothing to scan for, so skip straight to the fallback.
+    has_fence = "```" in ai_response
+    fenced_code = _find_fenced_code(ai_response) if has_fence else None
+
+    if fenced_code is not None:
+        extracted_code = fenced_code.strip()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "[ResponseParser] Extracted fenced code block (length: %d).",
+                len(extracted_code),
+            )
         return extracted_code
 
     # Handle cases where markdown exists but might be empty or non-python
-    if "```" in ai_response:
-        # If we are here, it means the regex did not match.
+    if has_fence:
+        # If we are here, it means no complete fenced block was found.
         # This could be an empty block like ``` ``` or a non-python block.
         # If it's just an empty block, we should return an empty string.
         # A simple check for content between backticks can be done.
         # This is a bit simplistic but covers the ` ``` ` case.
-        content_between_ticks = ai_response.split("```")[1]
+        # Only the first fenced segment is needed, so it is sliced out instead of
+        # splitting the whole response.
+        fence_start = ai_response.find("```") + 3
+        fence_end = ai_response.find("```", fence_start)
+        content_between_ticks = ai_response[fence_start : fence_end if fence_end != -1 else None]
         if not content_between_ticks.strip() or content_between_ticks.strip().lower() == "python":
              return ""
         # Otherwise, it might be a different language block, so we return None.
@@ -62,19 +71,94 @@ def extract_python_code_from_response(ai_response: str) -> str | None:
 
     # Fallback for no markdown at all
     response_strip = ai_response.strip()
-    keywords = ["def ", "import ", "class ", "assert ", "@"]
-    if any(kw in response_strip for kw in keywords):
-        logger.info(
+    if _FALLBACK_CODE_RE.search(response_strip):
+        logger.debug(
             "[ResponseParser] No fenced block, but Python keywords found. Assuming entire response is code."
         )
         return response_strip
 
-    logger.info(
+    logger.debug(
         "[ResponseParser] No Python code block found or response format not recognized."
     )
     return None
 
 
+def _find_fenced_code(text: str) -> str | None:
+    """
+    Returns the content of the first fenced code block, or None if there is none.
+
+    A block is "```", an optional "python"/"py" tag, whitespace up to a newline, then the
+    content up to the next "\n```". Each fence is tried in order with str.find, so the
+    scan runs at C speed and never backtracks.
+    """
+    fence = text.find("```")
+    while fence != -1:
+        code = _match_fenced_code_at(text, fence)
+        if code is not None:
+            return code
+        fence = text.find("```", fence + 1)
+    return None
+
+
+def _match_fenced_code_at(text: str, fence: int) -> str | None:
+    content_start = fence + 3
+    for language in _FENCE_LANGUAGES:
+        if text[content_start : content_start + len(language)].lower() == language:
+            content_start += len(language)
+            break
+
+    # The content starts after the last newline of the whitespace following the tag.
+    whitespace_end = content_start
+    while whitespace_end < len(text) and text[whitespace_end].isspace():
+        whitespace_end += 1
+    last_newline = text.rfind("\n", content_start, whitespace_end)
+    if last_newline == -1:
+        return None
+
+    content_end = text.find("\n```", last_newline + 1)
+    if content_end != -1:
+        return text[last_newline + 1 : content_end]
+    # An empty block: that last newline is the one before the closing fence.
+    previous_newline = text.rfind("\n", content_start, last_newline)
+    if previous_newline != -1 and text.startswith("```", last_newline + 1):
+        return text[previous_newline + 1 : last_newline]
+    return None
+
+
+def extract_python_code_per_file(ai_response: str) -> dict[str, str]:
+    """
+    Splits the response to a batched prompt into the test code of each file.
+
+    Every `<<<FILE path>>> ... <<<END>>>` block is parsed with
+    extract_python_code_from_response, so fenced code and NO_TESTS_NEEDED are handled
+    the same way as for single-file responses.
+
+    Args:
+        ai_response: The raw string response from the AI model.
+
+    Returns:
+        A dict mapping file paths to extracted code. Files whose block is missing or
+        contains no recognizable code are left out.
+    """
+    codes_by_file: dict[str, str] = {}
+    if not ai_response:
+        logger.debug("[ResponseParser] Received empty AI response.")
+        return codes_by_file
+
+    for match in _BATCH_FILE_BLOCK_RE.finditer(ai_response):
+        file_path = match.group(1).strip().strip("`")
+        extracted_code = extract_python_code_from_response(match.group(2))
+        if extracted_code is not None:
+            codes_by_file[file_path] = extracted_code
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "[ResponseParser] Extracted code for %d file(s) from batched response.",
+            len(codes_by_file),
+        )
+    return codes_by_file
+
+
 # --- Example Usage (for testing this module directly) ---
 if __name__ == "__main__":
     logger.info("--- Testing Response Parser ---")
@@ -82,17 +166,16 @@ if __name__ == "__main__":
     test_cases = [
         {
             "name": "Test 1: With Markdown Block (python specified)",
-            "response": """
-                Some introductory text from the AI.
-            """,
+            "response": (
+                "Some introductory text from the AI.\n"
+                "```python\n"
+                "def test_addition():\n"
+                "    assert 1 + 1 == 2\n"
+                "```\n"
+            ),
         }
     ]
 
-
-def test_example_addition():
-    assert 1 + 1 == 2
-
-
-# Another test function
-def test_example_subtraction():
-    assert 3 - 1 == 2
+    for test_case in test_cases:
+        logger.info(f"\n{test_case['name']}")
+        logger.info(extract_python_code_from_response(test_case["response"]))
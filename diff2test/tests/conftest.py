@@ -0,0 +1,20 @@
+import pytest
+from typer.testing import CliRunner
+
+
+@pytest.fixture(scope="session")
+def cli_runner():
+    """
+    모든 CLI 테스트가 함께 사용하는 CliRunner입니다.
+    """
+    return CliRunner()
+
+
+@pytest.fixture(scope="session")
+def cli_app():
+    """
+    Typer 앱입니다. 명령어 트리는 세션마다 한 번만 만들어집니다.
+    """
+    from diff2test.cli_parser import app
+
+    return app
@@ -1,13 +1,32 @@
+import threading
+import time
 from unittest import mock
 from unittest.mock import patch, MagicMock
 
 import pytest
 from google.api_core import exceptions as google_exceptions
 
-from diff2test.ai_client import generate_text_from_prompt, _initialize_vertex_ai, _vertex_ai_initialized_configs
+from diff2test.ai_client import (
+    generate_text_from_prompt,
+    _get_model,
+    _initialize_vertex_ai,
+    _response_memory_cache,
+    _vertex_ai_initialized_configs,
+    warm_up_vertex_ai,
+)
 from diff2test.models import AIConfig
 
 
+@pytest.fixture(autouse=True)
+def clear_model_cache():
+    """
+    모델 객체는 모듈 수준에서 캐시되므로, 테스트마다 새로 mock된 GenerativeModel을 사용하도록 캐시를 비웁니다.
+    """
+    _get_model.cache_clear()
+    yield
+    _get_model.cache_clear()
+
+
 @patch("diff2test.ai_client.vertexai.init")
 def test_init_vertex_ai_calls_sdk_init(mock_vertex_init):
     """
@@ -126,4 +145,226 @@ def test_generate_text_from_empty_prompt(mock_vertex_init, mock_generative_model
 
     # then
     assert result is None
-    mock_generative_model.return_value.generate_content.assert_not_called() 
\ No newline at end of file
+    mock_generative_model.return_value.generate_content.assert_not_called() 
+
+@patch("diff2test.ai_client.GenerativeModel")
+@patch("diff2test.ai_client.vertexai.init")
+def test_generate_text_from_prompt_streaming(
+    mock_vertex_init, mock_generative_model, capsys
+):
+    """
+    stream 옵션이 켜져 있을 때, 응답 청크를 즉시 출력하고 전체 텍스트를 이어 붙여 반환하는지 테스트합니다.
+    """
+    # given
+    prompt = "Generate a test for this diff."
+    ai_config = AIConfig(project_id="p1", region="r1", stream=True)
+
+    chunks = []
+    for text in ["def test_a():", "\n    assert True"]:
+        chunk = MagicMock()
+        chunk.text = text
+        chunks.append(chunk)
+    mock_model_instance = MagicMock()
+    mock_model_instance.generate_content.return_value = iter(chunks)
+    mock_generative_model.return_value = mock_model_instance
+
+    # when
+    result_text = generate_text_from_prompt(prompt, ai_config)
+
+    # then
+    mock_model_instance.generate_content.assert_called_once_with(
+        prompt,
+        generation_config=mock.ANY,
+        safety_settings=mock.ANY,
+        stream=True,
+    )
+    assert result_text == "def test_a():\n    assert True"
+    assert "def test_a():\n    assert True" in capsys.readouterr().out
+
+
+@patch("diff2test.ai_client.GenerativeModel")
+@patch("diff2test.ai_client.vertexai.init")
+def test_generate_text_from_prompt_uses_response_cache(
+    mock_vertex_init, mock_generative_model, tmp_path, monkeypatch
+):
+    """
+    캐시가 켜져 있을 때, 같은 프롬프트에 대해 두 번째 호출은 API를 호출하지 않고
+    디스크에 저장된 응답을 반환하는지 테스트합니다.
+    """
+    # given
+    monkeypatch.setenv("DTT_CACHE_DIR", str(tmp_path))
+    _response_memory_cache.clear()
+    prompt = "Generate a test for this diff."
+    ai_config = AIConfig(project_id="p1", region="r1", use_cache=True)
+
+    mock_model_instance = MagicMock()
+    mock_model_instance.generate_content.return_value.text = "cached test code"
+    mock_generative_model.return_value = mock_model_instance
+
+    # when
+    first_result = generate_text_from_prompt(prompt, ai_config)
+    _response_memory_cache.clear()  # 디스크 캐시에서 읽히는지 확인하기 위해 메모리 캐시를 비웁니다.
+    second_result = generate_text_from_prompt(prompt, ai_config)
+
+    # then
+    assert first_result == second_result == "cached test code"
+    mock_model_instance.generate_content.assert_called_once()
+    cached_files = list(tmp_path.glob("*.txt"))
+    assert len(cached_files) == 1
+    assert cached_files[0].read_text(encoding="utf-8") == "cached test code"
+
+
+@patch("diff2test.ai_client.GenerativeModel")
+@patch("diff2test.ai_client.vertexai.init")
+def test_generate_text_from_prompt_reuses_model(
+    mock_vertex_init, mock_generative_model
+):
+    """
+    같은 모델로 여러 번 호출해도 GenerativeModel 객체는 한 번만 생성되는지 테스트합니다.
+    """
+    # given
+    ai_config = AIConfig(project_id="p1", region="r1", model_name="gemini-test")
+    mock_generative_model.return_value.generate_content.return_value.text = "ok"
+
+    # when
+    generate_text_from_prompt("first prompt", ai_config)
+    generate_text_from_prompt("second prompt", ai_config)
+
+    # then
+    mock_generative_model.assert_called_once_with("gemini-test")
+    assert mock_generative_model.return_value.generate_content.call_count == 2
+
+
+@patch("diff2test.ai_client.time.sleep")
+@patch("diff2test.ai_client.GenerativeModel")
+@patch("diff2test.ai_client.vertexai.init")
+def test_generate_text_from_prompt_retries_transient_errors(
+    mock_vertex_init, mock_generative_model, mock_sleep
+):
+    """
+    일시적인 API 에러(할당량 초과 등)가 발생하면 대기 후 재시도하여 응답을 반환하는지 테스트합니다.
+    """
+    # given
+    ai_config = AIConfig(project_id="p1", region="r1", max_retries=3)
+    mock_response = MagicMock()
+    mock_response.text = "def test_retry(): pass"
+    mock_model_instance = mock_generative_model.return_value
+    mock_model_instance.generate_content.side_effect = [
+        google_exceptions.ResourceExhausted("Quota exceeded"),
+        google_exceptions.ServiceUnavailable("Try again"),
+        mock_response,
+    ]
+
+    # when
+    result_text = generate_text_from_prompt("prompt", ai_config)
+
+    # then
+    assert result_text == "def test_retry(): pass"
+    assert mock_model_instance.generate_content.call_count == 3
+    assert mock_sleep.call_count == 2
+    first_delay, second_delay = (c.args[0] for c in mock_sleep.call_args_list)
+    assert 1 <= first_delay < 2
+    assert 2 <= second_delay < 3
+
+
+@patch("diff2test.ai_client.time.sleep")
+@patch("diff2test.ai_client.GenerativeModel")
+@patch("diff2test.ai_client.vertexai.init")
+def test_generate_text_from_prompt_gives_up_after_max_retries(
+    mock_vertex_init, mock_generative_model, mock_sleep
+):
+    """
+    재시도 횟수를 모두 소진하면 None을 반환하고, 영구적인 에러는 재시도하지 않는지 테스트합니다.
+    """
+    # given
+    ai_config = AIConfig(project_id="p1", region="r1", max_retries=2)
+    mock_model_instance = mock_generative_model.return_value
+    mock_model_instance.generate_content.side_effect = (
+        google_exceptions.DeadlineExceeded("Timed out")
+    )
+
+    # when
+    result_text = generate_text_from_prompt("prompt", ai_config)
+
+    # then
+    assert result_text is None
+    assert mock_model_instance.generate_content.call_count == 3
+    assert mock_sleep.call_count == 2
+
+    # given
+    mock_model_instance.generate_content.reset_mock()
+    mock_sleep.reset_mock()
+    mock_model_instance.generate_content.side_effect = (
+        google_exceptions.PermissionDenied("No access")
+    )
+
+    # when
+    result_text = generate_text_from_prompt("prompt", ai_config)
+
+    # then
+    assert result_text is None
+    mock_model_instance.generate_content.assert_called_once()
+    mock_sleep.assert_not_called()
+
+
+def test_init_vertex_ai_runs_once_under_concurrency():
+    """
+    여러 스레드가 동시에 초기화를 시도해도 Vertex AI SDK 초기화는 한 번만 호출되는지 테스트합니다.
+    """
+    # given
+    _vertex_ai_initialized_configs.clear()
+    ai_config = AIConfig(project_id="p-concurrent", region="r1")
+    start_barrier = threading.Barrier(8)
+
+    def slow_init(**kwargs):
+        time.sleep(0.05)  # 초기화가 진행되는 동안 다른 스레드가 진입할 수 있도록 지연
+
+    def initialize():
+        start_barrier.wait()
+        _initialize_vertex_ai(ai_config)
+
+    # when
+    with patch("diff2test.ai_client.vertexai.init", side_effect=slow_init) as mock_init:
+        threads = [threading.Thread(target=initialize) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    # then
+    mock_init.assert_called_once_with(project="p-concurrent", location="r1")
+
+
+@pytest.mark.parametrize("warm_env, expected_ping_calls", [(None, 0), ("1", 1)])
+@patch("diff2test.ai_client.GenerativeModel")
+@patch("diff2test.ai_client.vertexai.init")
+def test_warm_up_vertex_ai_loads_model_once(
+    mock_vertex_init, mock_generative_model, monkeypatch, warm_env, expected_ping_calls
+):
+    """
+    warm_up_vertex_ai가 모델을 미리 로드하고, DTT_WARM=1일 때만 짧은 요청을 보내며,
+    이후 요청은 미리 로드된 모델을 재사용하는지 테스트합니다.
+    """
+    # given
+    if warm_env is None:
+        monkeypatch.delenv("DTT_WARM", raising=False)
+    else:
+        monkeypatch.setenv("DTT_WARM", warm_env)
+    ai_config = AIConfig(project_id="p1", region="r1", model_name="gemini-test")
+    mock_generative_model.return_value.generate_content.return_value.text = "ok"
+
+    # when
+    warm_up_vertex_ai(ai_config)
+
+    # then
+    mock_generative_model.assert_called_once_with("gemini-test")
+    assert (
+        mock_generative_model.return_value.generate_content.call_count
+        == expected_ping_calls
+    )
+
+    # when
+    generate_text_from_prompt("real prompt", ai_config)
+
+    # then
+    mock_generative_model.assert_called_once_with("gemini-test")
@@ -0,0 +1,59 @@
+from unittest.mock import patch
+
+from diff2test import cache
+
+
+def test_put_and_get_cached_test_code(tmp_path, monkeypatch):
+    """
+    저장한 테스트 코드를 같은 키로 다시 읽을 수 있고,
+    없는 키는 None을 반환하는지 테스트합니다.
+    """
+    # given
+    monkeypatch.setenv("DTT_CACHE_DIR", str(tmp_path))
+    key = cache.make_key("src/app.py", "+x = 1", "gemini-2.0-flash")
+
+    # when
+    missing_code = cache.get(key)
+    cache.put(key, "def test_app(): pass")
+    cached_code = cache.get(key)
+
+    # then
+    assert missing_code is None
+    assert cached_code == "def test_app(): pass"
+    assert list(tmp_path.glob("tests/*.tmp")) == []
+
+
+def test_cache_key_depends_on_path_diff_and_model():
+    """
+    파일 경로, diff 내용, 모델 이름 중 하나라도 다르면 다른 키가 만들어지는지 테스트합니다.
+    """
+    # given
+    key = cache.make_key("a.py", "+x = 1", "model-a")
+
+    # when
+    other_keys = {
+        cache.make_key("b.py", "+x = 1", "model-a"),
+        cache.make_key("a.py", "+x = 2", "model-a"),
+        cache.make_key("a.py", "+x = 1", "model-b"),
+    }
+
+    # then
+    assert key not in other_keys
+    assert len(other_keys) == 3
+
+
+def test_failed_write_leaves_no_temporary_file(tmp_path, monkeypatch):
+    """
+    캐시 파일을 쓰지 못하면(예: rename 실패) 예외를 내지 않고, 임시 파일도 남기지 않는지 테스트합니다.
+    """
+    # given
+    monkeypatch.setenv("DTT_CACHE_DIR", str(tmp_path))
+    key = cache.make_key("src/app.py", "+x = 1", "gemini-2.0-flash")
+
+    # when
+    with patch("diff2test.cache.os.replace", side_effect=OSError("read-only")):
+        cache.put(key, "def test_app(): pass")
+
+    # then
+    assert cache.get(key) is None
+    assert list(tmp_path.glob("tests/*")) == []
@@ -1,11 +1,6 @@
 from unittest.mock import patch
 
-from typer.testing import CliRunner
-
-from diff2test.cli_parser import app
-
-# CliRunner 인스턴스를 생성하여 CLI 명령어를 테스트
-runner = CliRunner()
+from diff2test.cli_parser import cli_current, cli_range
 
 
 @patch("diff2test.cli_parser.process_current_changes")
@@ -20,24 +15,16 @@ def test_cli_current_command_with_options(mock_process_current_changes):
     target = "src/"
 
     # when
-    result = runner.invoke(
-        app,
-        [
-            "current",
-            "--project",
-            project_id,
-            "--region",
-            region,
-            "--output-dir",
-            output_dir,
-            "--target",
-            target,
-            "--interactive",
-        ],
+    # 옵션 파싱은 Typer의 몫이므로, 명령어 함수를 직접 호출해 Click 파싱 비용 없이 검증합니다.
+    cli_current(
+        project_id=project_id,
+        region=region,
+        output_dir=output_dir,
+        target=target,
+        interactive=True,
     )
 
     # then
-    assert result.exit_code == 0
     # 내부 함수가 올바른 인자들로 호출되었는지 확인
     mock_process_current_changes.assert_called_once_with(
         project_id=project_id,
@@ -45,6 +32,10 @@ def test_cli_current_command_with_options(mock_process_current_changes):
         output_dir=output_dir,
         interactive=True,
         target=target,
+        stream=False,
+        use_cache=True,
+        batch=False,
+        interactive_legacy=False,
     )
 
 
@@ -60,21 +51,9 @@ def test_cli_range_command(mock_process_commit_range):
     region = "default-region"
 
     # when
-    result = runner.invoke(
-        app,
-        [
-            "range",
-            commit_a,
-            commit_b,
-            "-p",  # 짧은 옵션 사용
-            project_id,
-            "-r",
-            region,
-        ],
-    )
+    cli_range(commit_a, commit_b, project_id=project_id, region=region)
 
     # then
-    assert result.exit_code == 0
     mock_process_commit_range.assert_called_once_with(
         commit_a,
         commit_b,
@@ -83,10 +62,14 @@ def test_cli_range_command(mock_process_commit_range):
         output_dir=None,
         interactive=False,
         target=None,
+        stream=False,
+        use_cache=True,
+        batch=False,
+        interactive_legacy=False,
     )
 
 
-def test_cli_current_missing_required_options():
+def test_cli_current_missing_required_options(cli_runner, cli_app):
     """
     `dtt current` 명령어에서 필수 옵션(project, region)이 누락되었을 때,
     에러 메시지를 출력하고 종료 코드 1로 실패하는지 테스트합니다.
@@ -94,7 +77,7 @@ def test_cli_current_missing_required_options():
     """
     # when
     # Project ID와 Region 없이 호출
-    result = runner.invoke(app, ["current"])
+    result = cli_runner.invoke(cli_app, ["current"])
 
     # then
     # cli_parser의 현재 로직은 필수 옵션이 없어도 에러 메시지만 출력하고 return (exit_code=0)
@@ -108,13 +91,13 @@ def test_cli_current_missing_required_options():
     {"DTT_PROJECT_ID": "env-project", "DTT_REGION": "env-region"},
 )
 @patch("diff2test.cli_parser.process_current_changes")
-def test_cli_current_with_env_vars(mock_process_current_changes):
+def test_cli_current_with_env_vars(mock_process_current_changes, cli_runner, cli_app):
     """
     CLI 옵션 대신 환경 변수를 사용하여 `dtt current`를 실행했을 때,
     내부 함수가 환경 변수 값으로 올바르게 호출되는지 테스트합니다.
     """
     # when
-    result = runner.invoke(app, ["current"])
+    result = cli_runner.invoke(cli_app, ["current"])
 
     # then
     assert result.exit_code == 0
@@ -124,4 +107,8 @@ def test_cli_current_with_env_vars(mock_process_current_changes):
         output_dir=None,
         interactive=False,
         target=None,
+        stream=False,
+        use_cache=True,
+        batch=False,
+        interactive_legacy=False,
     ) 
\ No newline at end of file
@@ -1,14 +1,35 @@
+import io
 import os
-from unittest.mock import patch, mock_open, ANY
+import threading
+from unittest.mock import patch
 
 import pytest
-from diff2test.file_writer import save_test_code_to_file
+from diff2test import file_writer
+from diff2test.file_writer import (
+    DIRECT_WRITE_MAX_SIZE,
+    WRITE_BUFFER_SIZE,
+    save_test_code_to_file,
+    save_test_codes_batch,
+)
 
+# 프로세스 전역의 os, io 함수를 patch하는 테스트들이므로, 같은 xdist 워커에서 실행합니다.
+pytestmark = pytest.mark.xdist_group("io")
 
-@patch("pathlib.Path.mkdir")
-@patch("builtins.open", new_callable=mock_open)
+
+@pytest.fixture(autouse=True)
+def clear_known_dirs():
+    """
+    생성된 디렉토리 목록은 모듈 수준에서 캐시되므로, 테스트마다 비웁니다.
+    """
+    file_writer._known_dirs.clear()
+    yield
+    file_writer._known_dirs.clear()
+
+
+@patch("diff2test.file_writer.os.makedirs")
+@patch("diff2test.file_writer._write_payload")
 def test_save_test_code_to_file_creates_directory_and_writes_file(
-    mock_open_file, mock_mkdir
+    mock_write_payload, mock_makedirs
 ):
     """
     save_test_code_to_file 함수가 대상 디렉토리를 생성하고,
@@ -29,19 +50,21 @@ def test_save_test_code_to_file_creates_directory_and_writes_file(
 
     # then
     # 1. 디렉토리 생성 확인
-    mock_mkdir.assert_called_once_with(parents=True, exist_ok=True)
+    mock_makedirs.assert_called_once_with(
+        os.path.join(output_dir, "src", "my_module"), exist_ok=True
+    )
 
     # 2. 파일 쓰기 확인
-    # open 함수는 Path 객체를 인자로 받으므로, ANY로 확인합니다.
-    mock_open_file.assert_called_once_with(ANY, "w", encoding="utf-8")
-    mock_open_file().write.assert_called_once_with(generated_code)
+    mock_write_payload.assert_called_once_with(
+        expected_test_file_path, generated_code.encode("utf-8"), WRITE_BUFFER_SIZE
+    )
 
     # 3. 반환된 경로 확인
-    # resolve() 때문에 절대 경로가 되므로, endswith로 확인
+    # 현재 작업 디렉토리 기준의 절대 경로가 되므로, endswith로 확인
     assert saved_path.endswith(expected_test_file_path)
 
-@patch("pathlib.Path.mkdir", side_effect=IOError("Permission denied"))
-def test_save_fails_on_directory_creation(mock_mkdir):
+@patch("diff2test.file_writer.os.makedirs", side_effect=IOError("Permission denied"))
+def test_save_fails_on_directory_creation(mock_makedirs):
     """
     디렉토리 생성 중 OS 에러(예: 권한 없음)가 발생했을 때,
     함수가 None을 반환하며 정상적으로 종료되는지 테스트합니다.
@@ -60,9 +83,9 @@ def test_save_fails_on_directory_creation(mock_mkdir):
     assert saved_path is None
 
 
-@patch("pathlib.Path.mkdir")
-@patch("builtins.open", side_effect=IOError("Disk full"))
-def test_save_fails_on_file_write(mock_open, mock_mkdir):
+@patch("diff2test.file_writer.os.makedirs")
+@patch("diff2test.file_writer._write_payload", side_effect=IOError("Disk full"))
+def test_save_fails_on_file_write(mock_write_payload, mock_makedirs):
     """
     파일 쓰기 중 OS 에러(예: 디스크 꽉 참)가 발생했을 때,
     함수가 None을 반환하며 정상적으로 종료되는지 테스트합니다.
@@ -78,4 +101,213 @@ def test_save_fails_on_file_write(mock_open, mock_mkdir):
     )
 
     # then
-    assert saved_path is None 
\ No newline at end of file
+    assert saved_path is None 
+
+
+def test_save_test_codes_batch_writes_all_files(tmp_path):
+    """
+    save_test_codes_batch 함수가 여러 테스트 파일을 한 번에 저장하고,
+    빈 테스트 코드는 건너뛰며 입력 순서대로 경로를 반환하는지 테스트합니다.
+    (liburing이 없으면 파일별 저장 방식으로 동작합니다.)
+    """
+    # given
+    items = [
+        ("src/a.py", "def test_a(): pass\n"),
+        ("src/pkg/b.py", "def test_b(): pass\n"),
+        ("src/empty.py", ""),
+        ("c.py", "def test_c(): pass\n"),
+    ]
+
+    # when
+    saved_paths = save_test_codes_batch(items, str(tmp_path))
+
+    # then
+    assert saved_paths[2] is None
+    expected_files = [
+        tmp_path / "src" / "test_a.py",
+        tmp_path / "src" / "pkg" / "test_b.py",
+        None,
+        tmp_path / "test_c.py",
+    ]
+    for (_, code), saved_path, expected_file in zip(items, saved_paths, expected_files):
+        if expected_file is None:
+            continue
+        assert saved_path == str(expected_file.resolve())
+        assert expected_file.read_text(encoding="utf-8") == code
+
+
+def test_save_test_codes_batch_falls_back_when_io_uring_fails(tmp_path, monkeypatch):
+    """
+    io_uring을 사용할 수 없을 때(예: 커널 미지원) 파일별 저장 방식으로 대신 저장하는지 테스트합니다.
+    """
+    # given
+    monkeypatch.setattr(file_writer, "liburing", object())
+    items = [("a.py", "def test_a(): pass"), ("b.py", "def test_b(): pass")]
+
+    # when
+    with patch(
+        "diff2test.file_writer._write_files_with_io_uring",
+        side_effect=OSError("io_uring not supported"),
+    ):
+        saved_paths = save_test_codes_batch(items, str(tmp_path))
+
+    # then
+    assert saved_paths == [
+        str((tmp_path / "test_a.py").resolve()),
+        str((tmp_path / "test_b.py").resolve()),
+    ]
+    assert (tmp_path / "test_b.py").read_text(encoding="utf-8") == "def test_b(): pass"
+
+
+def test_io_uring_writes_report_the_error_of_each_file(tmp_path):
+    """
+    실제 io_uring으로 파일을 쓸 때, 성공한 파일은 open()과 같은 권한으로 만들어지고
+    실패한 파일은 취소(ECANCELED)가 아니라 실제 원인(예: 디렉토리 없음)으로 보고되는지 테스트합니다.
+    (liburing이 설치되어 있고 커널이 io_uring을 지원할 때만 실행됩니다.)
+    """
+    # given
+    pytest.importorskip("liburing")
+    if file_writer.liburing is None:
+        pytest.skip("liburing could not be loaded by the file writer")
+    written_file = tmp_path / "test_a.py"
+    missing_dir_file = tmp_path / "missing" / "test_b.py"
+    umask = os.umask(0)
+    os.umask(umask)
+
+    # when
+    try:
+        errors = file_writer._write_files_with_io_uring(
+            [(str(written_file), b"x = 1\n"), (str(missing_dir_file), b"y = 2\n")]
+        )
+    except OSError as e:
+        pytest.skip(f"io_uring is unavailable: {e}")
+
+    # then
+    assert errors[0] is None
+    assert written_file.read_bytes() == b"x = 1\n"
+    assert written_file.stat().st_mode & 0o777 == 0o666 & ~umask
+    assert isinstance(errors[1], FileNotFoundError)
+
+
+@patch("diff2test.file_writer.os.makedirs")
+@patch("diff2test.file_writer._write_payload")
+def test_save_skips_directory_creation_for_known_directories(
+    mock_write_payload, mock_makedirs
+):
+    """
+    같은 디렉토리나 이미 만든 디렉토리의 상위 디렉토리에 여러 파일을 저장할 때,
+    이미 만든 디렉토리는 다시 만들지 않는지 테스트합니다.
+    """
+    # given
+    output_dir = "generated_tests"
+
+    # when
+    save_test_code_to_file("src/pkg/a.py", "def test_a(): pass", output_dir)
+    save_test_code_to_file("src/pkg/b.py", "def test_b(): pass", output_dir)
+    save_test_code_to_file("src/c.py", "def test_c(): pass", output_dir)
+
+    # then
+    mock_makedirs.assert_called_once_with(
+        os.path.join(output_dir, "src", "pkg"), exist_ok=True
+    )
+    assert mock_write_payload.call_count == 3
+
+
+def test_save_test_code_to_file_accepts_encoded_bytes(tmp_path):
+    """
+    이미 UTF-8로 인코딩된 bytes 테스트 코드도 그대로 저장하는지 테스트합니다.
+    """
+    # given
+    generated_code = "def test_greeting():\n    assert greet() == '안녕'\n"
+
+    # when
+    saved_path = save_test_code_to_file(
+        "greeting.py", generated_code.encode("utf-8"), str(tmp_path)
+    )
+
+    # then
+    assert saved_path == str((tmp_path / "test_greeting.py").resolve())
+    assert (tmp_path / "test_greeting.py").read_text(encoding="utf-8") == generated_code
+
+
+@pytest.mark.parametrize(
+    "payload_size, uses_buffered_writer",
+    [(100, False), (DIRECT_WRITE_MAX_SIZE, True)],
+)
+def test_save_test_code_to_file_writes_small_payloads_directly(
+    tmp_path, payload_size, uses_buffered_writer
+):
+    """
+    작은 테스트 코드는 BufferedWriter 없이 os.write로 바로 쓰고,
+    큰 테스트 코드는 BufferedWriter로 쓰며, 두 경우 모두 기존 파일 내용을 덮어쓰는지 테스트합니다.
+    """
+    # given
+    generated_code = "x" * payload_size
+    (tmp_path / "test_big.py").write_text("old content " * 10000, encoding="utf-8")
+
+    # when
+    with patch(
+        "diff2test.file_writer.io.BufferedWriter", wraps=io.BufferedWriter
+    ) as mock_buffered_writer:
+        saved_path = save_test_code_to_file("big.py", generated_code, str(tmp_path))
+
+    # then
+    assert saved_path == str((tmp_path / "test_big.py").resolve())
+    assert (tmp_path / "test_big.py").read_text(encoding="utf-8") == generated_code
+    assert mock_buffered_writer.called is uses_buffered_writer
+
+
+def test_save_test_code_to_file_retries_short_direct_writes(tmp_path):
+    """
+    os.write가 요청보다 적게 쓰더라도(short write), 남은 내용을 이어서 모두 쓰는지 테스트합니다.
+    """
+    # given
+    generated_code = "def test_short_write():\n    assert True\n"
+    real_write = os.write
+
+    def write_at_most_five_bytes(fd, data):
+        return real_write(fd, bytes(data[:5]))
+
+    # when
+    with patch("diff2test.file_writer.os.write", side_effect=write_at_most_five_bytes):
+        saved_path = save_test_code_to_file("short.py", generated_code, str(tmp_path))
+
+    # then
+    assert saved_path == str((tmp_path / "test_short.py").resolve())
+    assert (tmp_path / "test_short.py").read_text(encoding="utf-8") == generated_code
+
+
+def test_save_test_codes_batch_saves_files_in_parallel_without_io_uring(
+    tmp_path, monkeypatch
+):
+    """
+    liburing이 없을 때 여러 파일을 스레드 풀에서 함께 저장하고,
+    디렉토리는 디렉토리마다 한 번만 만들며, 입력 순서대로 경로를 반환하는지 테스트합니다.
+    """
+    # given
+    monkeypatch.setattr(file_writer, "liburing", None)
+    items = [(f"pkg/m{i}.py", f"def test_{i}(): pass\n") for i in range(8)]
+    items.append(("other/n.py", "def test_n(): pass\n"))
+    saving_threads = set()
+    real_write_payload = file_writer._write_payload
+
+    def write_payload(*args):
+        saving_threads.add(threading.get_ident())
+        real_write_payload(*args)
+
+    # when
+    with patch(
+        "diff2test.file_writer.os.makedirs", wraps=os.makedirs
+    ) as mock_makedirs, patch(
+        "diff2test.file_writer._write_payload", side_effect=write_payload
+    ):
+        saved_paths = save_test_codes_batch(items, str(tmp_path))
+
+    # then
+    assert saved_paths == [
+        str((tmp_path / os.path.dirname(path) / f"test_{os.path.basename(path)}").resolve())
+        for path, _ in items
+    ]
+    assert (tmp_path / "pkg" / "test_m7.py").read_text(encoding="utf-8") == items[7][1]
+    assert mock_makedirs.call_count == 2
+    assert threading.get_ident() not in saving_threads
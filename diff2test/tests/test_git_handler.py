@@ -1,18 +1,103 @@
+import io
 import subprocess
-from unittest.mock import MagicMock, patch
 
 import pytest
-from diff2test.git_handler import get_current_changes, get_diff_between_commits
+from diff2test.git_handler import (
+    GIT_OUTPUT_BUFFER_SIZE,
+    _GIT,
+    _get_effective_pathspecs,
+    _parse_diff_stream,
+    get_current_changes,
+    get_diff_between_commits,
+)
 from diff2test.models import DiffInfo
 
+# 프로세스 전역의 subprocess.Popen을 바꾸는 테스트들이므로, 같은 xdist 워커에서 실행합니다.
+pytestmark = pytest.mark.xdist_group("io")
 
-@patch("subprocess.run")
-def test_get_current_changes_with_valid_diff(mock_subprocess_run):
+# get_current_changes(target=None)가 실행하는 git 명령어
+CURRENT_CHANGES_COMMAND = (
+    _GIT,
+    "--no-pager",
+    "diff",
+    "--no-color",
+    "--no-ext-diff",
+    "-z",
+    "--patch-with-raw",
+    "--unified=0",
+    "HEAD",
+    "--",
+    "**/*.py",
+    ":(exclude)**/test_*.py",
+)
+
+
+class _FakeProcess:
+    """
+    정해진 출력을 stdout으로 내보내고 정해진 종료 코드로 끝나는 git 프로세스입니다.
+    """
+
+    def __init__(self, stdout: bytes, returncode: int):
+        self.stdout = io.BytesIO(stdout)
+        self._returncode = returncode
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stdout.close()
+
+    def wait(self):
+        return self._returncode
+
+
+class FakeGit:
+    """
+    subprocess.Popen 대신 설치되는 가짜 git입니다.
+    responses에 명령어(tuple)별 (stdout, 종료 코드)를 지정합니다.
+    지정되지 않은 명령어는 빈 출력으로 성공합니다.
+    """
+
+    def __init__(self):
+        self.responses: dict[tuple[str, ...], tuple[bytes, int]] = {}
+        self.calls: list[tuple[list[str], dict]] = []
+
+    def __call__(self, command, **kwargs):
+        self.calls.append((command, kwargs))
+        stdout, returncode = self.responses.get(tuple(command), (b"", 0))
+        return _FakeProcess(stdout, returncode)
+
+    def set_output(self, command: tuple[str, ...], stdout: str | bytes, returncode: int = 0):
+        if isinstance(stdout, str):
+            stdout = stdout.encode("utf-8")
+        self.responses[command] = (stdout, returncode)
+
+
+@pytest.fixture(autouse=True)
+def fake_git(monkeypatch):
+    """
+    모든 테스트에서 실제 git 대신 FakeGit이 실행되도록 합니다.
+    """
+    fake = FakeGit()
+    monkeypatch.setattr("diff2test.git_handler.subprocess.Popen", fake)
+    return fake
+
+
+def _raw_records(*records: tuple[str, str]) -> str:
+    """
+    `git diff -z --patch-with-raw` 출력 앞부분의 NUL 구분 raw 레코드를 (status, path) 목록으로 만듭니다.
+    """
+    return "".join(
+        f":100644 100644 1111111 2222222 {status}\x00{path}\x00" for status, path in records
+    ) + "\x00"
+
+
+def test_get_current_changes_with_valid_diff(fake_git):
     """
     `git diff`가 유효한 변경 사항을 반환할 때, get_current_changes가 DiffInfo 객체 리스트를 올바르게 생성하는지 테스트합니다.
     """
     # given
-    mock_diff_output = (
+    mock_diff_output = _raw_records(("M", "sample.py")) + (
         "diff --git a/sample.py b/sample.py\n"
         "--- a/sample.py\n"
         "+++ b/sample.py\n"
@@ -22,14 +107,10 @@ def test_get_current_changes_with_valid_diff(mock_subprocess_run):
         "-    pass\n"
         "+    return 'hello'\n"
     )
-    # mock_subprocess_run의 반환 객체 설정
-    mock_result = MagicMock()
-    mock_result.stdout = mock_diff_output
-    mock_result.returncode = 0
-    mock_subprocess_run.return_value = mock_result
+    fake_git.set_output(CURRENT_CHANGES_COMMAND, mock_diff_output)
 
     # when
-    diff_infos = get_current_changes(target=None)
+    diff_infos = list(get_current_changes(target=None))
 
     # then
     assert len(diff_infos) == 1
@@ -37,97 +118,138 @@ def test_get_current_changes_with_valid_diff(mock_subprocess_run):
     assert diff_infos[0].file_path == "sample.py"
     assert "+import os" in diff_infos[0].diff_content
     # git diff HEAD -- **/*.py ':(exclude)**/test_*.py' 를 호출했는지 검증
-    mock_subprocess_run.assert_called_with(
-        [
-            "git",
-            "diff",
-            "--unified=3",
-            "HEAD",
-            "--",
-            "**/*.py",
-            ":(exclude)**/test_*.py",
-        ],
-        capture_output=True,
-        text=True,
-        check=True,
-        encoding="utf-8",
+    [(command, kwargs)] = fake_git.calls
+    assert tuple(command) == CURRENT_CHANGES_COMMAND
+    assert kwargs["stdout"] == subprocess.PIPE
+    assert kwargs["bufsize"] == GIT_OUTPUT_BUFFER_SIZE
+
+
+def _range_command(commit_a: str, commit_b: str, context_lines: int = 0) -> tuple[str, ...]:
+    """
+    get_diff_between_commits(commit_a, commit_b, target=None)가 실행하는 git 명령어를 만듭니다.
+    """
+    return (
+        _GIT,
+        "--no-pager",
+        "diff",
+        "--no-color",
+        "--no-ext-diff",
+        "-z",
+        "--patch-with-raw",
+        "-M",
+        "--diff-filter=AMRT",
+        f"--unified={context_lines}",
+        commit_a,
+        commit_b,
+        "--",
+        "**/*.py",
+        ":(exclude)**/test_*.py",
     )
 
 
-@patch("subprocess.run")
-def test_get_diff_between_commits(mock_subprocess_run):
+def test_get_diff_between_commits(fake_git):
     """
     두 커밋 사이의 `git diff`가 유효한 변경 사항을 반환할 때, get_diff_between_commits가 DiffInfo 객체 리스트를 올바르게 생성하는지 테스트합니다.
+    파일 수와 관계없이 하나의 git 프로세스가 모든 파일의 diff를 출력해야 합니다.
     """
     # given
-    mock_diff_output = "diff --git a/another.py b/another.py\n--- a/another.py\n+++ b/another.py\n@@ -1,1 +1,1 @@\n-old line\n+new line\n"
-    mock_result = MagicMock()
-    mock_result.stdout = mock_diff_output
-    mock_result.returncode = 0
-    mock_subprocess_run.return_value = mock_result
     commit_a = "HEAD~1"
     commit_b = "HEAD"
+    range_command = _range_command(commit_a, commit_b, context_lines=3)
+    fake_git.set_output(
+        range_command,
+        ":100644 100644 1111111 2222222 M\x00another.py\x00"
+        ":000000 100644 0000000 3333333 A\x00pkg/new.py\x00\x00"
+        "diff --git a/another.py b/another.py\n"
+        "index 1111111..2222222 100644\n"
+        "--- a/another.py\n"
+        "+++ b/another.py\n"
+        "@@ -1,2 +1,2 @@\n"
+        "-old line\n"
+        "+new line\n"
+        " kept line\n"
+        "diff --git a/pkg/new.py b/pkg/new.py\n"
+        "new file mode 100644\n"
+        "index 0000000..3333333\n"
+        "--- /dev/null\n"
+        "+++ b/pkg/new.py\n"
+        "@@ -0,0 +1 @@\n"
+        "+x = 1\n",
+    )
 
     # when
-    diff_infos = get_diff_between_commits(commit_a, commit_b, target=None)
+    diff_infos = list(
+        get_diff_between_commits(commit_a, commit_b, target=None, context_lines=3)
+    )
 
     # then
-    assert len(diff_infos) == 1
-    assert diff_infos[0].file_path == "another.py"
-    assert "new line" in diff_infos[0].diff_content
-    mock_subprocess_run.assert_called_with(
-        [
-            "git",
-            "diff",
-            "--unified=3",
-            commit_a,
-            commit_b,
-            "--",
-            "**/*.py",
-            ":(exclude)**/test_*.py",
-        ],
-        capture_output=True,
-        text=True,
-        check=True,
-        encoding="utf-8",
+    assert [d.file_path for d in diff_infos] == ["another.py", "pkg/new.py"]
+    assert diff_infos[0].diff_content.endswith("-old line\n+new line\n kept line")
+    assert diff_infos[1].diff_content.startswith(
+        "diff --git a/pkg/new.py b/pkg/new.py\nnew file mode 100644\n"
+    )
+    assert [tuple(command) for command, _ in fake_git.calls] == [range_command]
+
+
+def test_get_diff_between_commits_reports_renamed_files_under_new_path(fake_git):
+    """
+    커밋 범위에서 이름이 바뀐 파일은 raw 레코드의 새 경로로 보고되고,
+    diff에는 이름 변경 헤더와 실제로 바뀐 줄만 담기는지 테스트합니다.
+    """
+    # given
+    renamed_diff = (
+        "diff --git a/old.py b/pkg/new.py\n"
+        "similarity index 87%\n"
+        "rename from old.py\n"
+        "rename to pkg/new.py\n"
+        "index 1111111..2222222 100644\n"
+        "--- a/old.py\n"
+        "+++ b/pkg/new.py\n"
+        "@@ -2 +2 @@\n"
+        "-b = 2\n"
+        "+b = 20"
+    )
+    fake_git.set_output(
+        _range_command("HEAD~1", "HEAD"),
+        ":100644 100644 1111111 2222222 R087\x00old.py\x00pkg/new.py\x00\x00"
+        + renamed_diff
+        + "\n",
     )
 
+    # when
+    diff_infos = list(get_diff_between_commits("HEAD~1", "HEAD", target=None))
+
+    # then
+    assert diff_infos == [DiffInfo(file_path="pkg/new.py", diff_content=renamed_diff)]
+
 
-@patch("subprocess.run")
-def test_get_current_changes_no_diff(mock_subprocess_run):
+def test_get_current_changes_no_diff(fake_git):
     """
     변경 사항이 없을 때, get_current_changes가 빈 리스트를 반환하는지 테스트합니다.
     """
     # given
-    mock_result = MagicMock()
-    mock_result.stdout = ""  # 변경 내용 없음
-    mock_result.returncode = 0
-    mock_subprocess_run.return_value = mock_result
+    fake_git.set_output(CURRENT_CHANGES_COMMAND, "")  # 변경 내용 없음
 
     # when
-    diff_infos = get_current_changes(target=None)
+    diff_infos = list(get_current_changes(target=None))
 
     # then
     assert len(diff_infos) == 0
 
 
-@patch("subprocess.run")
-def test_git_command_fails(mock_subprocess_run):
+def test_git_command_fails(fake_git):
     """
     git 명령어 실행이 실패할 때 (예: git 저장소가 아님), CalledProcessError 예외가 발생하는지 테스트합니다.
     """
     # given
-    mock_subprocess_run.side_effect = subprocess.CalledProcessError(
-        128, "git diff", stderr="fatal: not a git repository"
-    )
+    fake_git.set_output(CURRENT_CHANGES_COMMAND, "", returncode=128)
 
     # when / then
     with pytest.raises(subprocess.CalledProcessError):
-        get_current_changes(target=None)
+        list(get_current_changes(target=None))
 
 
-@patch("subprocess.run")
-def test_diff_parser_excludes_test_files(mock_subprocess_run):
+def test_diff_parser_excludes_test_files(fake_git):
     """
     git diff 명령어가 'test_*.py' 파일을 올바르게 제외하는지 테스트합니다.
     _get_effective_pathspecs 함수가 생성하는 git 인자를 통해 필터링됩니다.
@@ -136,7 +258,7 @@ def test_diff_parser_excludes_test_files(mock_subprocess_run):
     # git diff 명령어는 ':(exclude)**/test_*.py' 패턴에 의해
     # test_app.py 파일을 결과에서 제외해야 합니다.
     # 따라서 mock 응답에는 해당 파일의 diff가 포함되지 않아야 합니다.
-    mock_diff_output = (
+    mock_diff_output = _raw_records(("M", "src/app.py")) + (
         "diff --git a/src/app.py b/src/app.py\n"
         "--- a/src/app.py\n"
         "+++ b/src/app.py\n"
@@ -144,15 +266,154 @@ def test_diff_parser_excludes_test_files(mock_subprocess_run):
         "-a\n"
         "+b\n"
     )
-    mock_result = MagicMock()
-    mock_result.stdout = mock_diff_output
-    mock_result.returncode = 0
-    mock_subprocess_run.return_value = mock_result
+    fake_git.set_output(CURRENT_CHANGES_COMMAND, mock_diff_output)
 
     # when
-    diff_infos = get_current_changes(target=None)
+    diff_infos = list(get_current_changes(target=None))
 
     # then
     # _get_effective_pathspecs에 의해 test_app.py는 제외되어야 함
     assert len(diff_infos) == 1
-    assert diff_infos[0].file_path == "src/app.py" 
\ No newline at end of file
+    assert diff_infos[0].file_path == "src/app.py" 
+
+
+def test_diff_parser_splits_files_and_decodes_invalid_utf8(fake_git):
+    """
+    여러 파일의 diff를 파일별 DiffInfo로 나누고,
+    UTF-8이 아닌 바이트가 있어도 대체 문자로 디코딩하는지 테스트합니다.
+    """
+    # given
+    fake_git.set_output(
+        CURRENT_CHANGES_COMMAND,
+        _raw_records(("M", "a.py"), ("M", "b.py")).encode("utf-8")
+        + b"diff --git a/a.py b/a.py\n"
+        b"--- a/a.py\n"
+        b"+++ b/a.py\n"
+        b"@@ -1 +1 @@\n"
+        b"+name = '\xff'\n"
+        b"diff --git a/b.py b/b.py\n"
+        b"--- a/b.py\n"
+        b"+++ b/b.py\n"
+        b"@@ -1 +1 @@\n"
+        b"+b = 2\n",
+    )
+
+    # when
+    diff_infos = list(get_current_changes(target=None))
+
+    # then
+    assert [d.file_path for d in diff_infos] == ["a.py", "b.py"]
+    assert "+name = '\ufffd'" in diff_infos[0].diff_content
+    assert diff_infos[1].diff_content.startswith("diff --git a/b.py b/b.py\n")
+    assert diff_infos[1].diff_content.endswith("+b = 2")
+
+
+def test_diff_parser_uses_old_path_for_deleted_files(fake_git):
+    """
+    삭제된 파일의 diff(+++ /dev/null)는 '--- a/' 경로를 파일 경로로 사용하는지 테스트합니다.
+    """
+    # given
+    mock_patch_output = (
+        "diff --git a/old.py b/old.py\n"
+        "deleted file mode 100644\n"
+        "--- a/old.py\n"
+        "+++ /dev/null\n"
+        "@@ -1 +0,0 @@\n"
+        "-x = 1\n"
+    )
+    fake_git.set_output(
+        CURRENT_CHANGES_COMMAND, _raw_records(("D", "old.py")) + mock_patch_output
+    )
+
+    # when
+    diff_infos = list(get_current_changes(target=None))
+
+    # then
+    assert len(diff_infos) == 1
+    assert diff_infos[0].file_path == "old.py"
+    assert diff_infos[0].diff_content == mock_patch_output.rstrip()
+
+
+def test_diff_parser_takes_paths_from_raw_records(fake_git):
+    """
+    patch 헤더에서 따옴표로 감싸지는 경로(비ASCII 파일명)와 이름이 바뀐 파일의 경로를
+    raw 레코드에서 가져오고, hunk가 없는 diff(모드 변경 등)는 건너뛰는지 테스트합니다.
+    """
+    # given
+    raw_output = (
+        ":100644 100755 1111111 1111111 M\x00mode.py\x00"
+        ":100644 100644 1111111 2222222 R050\x00old.py\x00new.py\x00"
+        ":000000 100644 0000000 2222222 A\x00pkg/\u00e9.py\x00"
+        "\x00"
+    )
+    mock_patch_output = (
+        "diff --git a/mode.py b/mode.py\n"
+        "old mode 100644\n"
+        "new mode 100755\n"
+        "diff --git a/old.py b/new.py\n"
+        "rename from old.py\n"
+        "rename to new.py\n"
+        "--- a/old.py\n"
+        "+++ b/new.py\n"
+        "@@ -1 +1 @@\n"
+        "-a = 1\n"
+        "+a = 2\n"
+        'diff --git "a/pkg/\\303\\251.py" "b/pkg/\\303\\251.py"\n'
+        "new file mode 100644\n"
+        "--- /dev/null\n"
+        '+++ "b/pkg/\\303\\251.py"\n'
+        "@@ -0,0 +1 @@\n"
+        "+z = 1\n"
+    )
+    fake_git.set_output(CURRENT_CHANGES_COMMAND, raw_output + mock_patch_output)
+
+    # when
+    diff_infos = list(get_current_changes(target=None))
+
+    # then
+    assert [d.file_path for d in diff_infos] == ["new.py", "pkg/\u00e9.py"]
+    assert diff_infos[0].diff_content.startswith("diff --git a/old.py b/new.py\n")
+    assert diff_infos[1].diff_content.endswith("+z = 1")
+
+
+def test_effective_pathspecs_are_cached_per_target():
+    """
+    같은 target에 대해 pathspec을 한 번만 계산하고 불변 tuple을 재사용하는지 테스트합니다.
+    """
+    # given
+    _get_effective_pathspecs.cache_clear()
+
+    # when
+    first = _get_effective_pathspecs(None)
+    second = _get_effective_pathspecs(None)
+
+    # then
+    assert isinstance(first, tuple)
+    assert first is second
+    assert _get_effective_pathspecs.cache_info().hits == 1
+
+
+def test_diff_parser_handles_output_split_at_any_point():
+    """
+    git 출력이 임의의 위치(헤더 중간 포함)에서 여러 조각으로 나뉘어 도착해도,
+    한 번에 도착한 경우와 같은 DiffInfo 목록을 만드는지 테스트합니다.
+    """
+    # given
+    output = (
+        _raw_records(("M", "a.py"), ("M", "b.py"))
+        + "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-a\n+diff --git x\n"
+        + "diff --git a/b.py b/b.py\n--- a/b.py\n+++ b/b.py\n@@ -1 +1 @@\n+b = 2\n"
+    ).encode("utf-8")
+    expected = list(_parse_diff_stream([output]))
+
+    # when
+    split_results = [
+        list(_parse_diff_stream([output[:i], output[i:j], output[j:]]))
+        for i in range(0, len(output), 7)
+        for j in range(i, len(output), 13)
+    ]
+
+    # then
+    assert [d.file_path for d in expected] == ["a.py", "b.py"]
+    assert expected[0].diff_content.endswith("+diff --git x")
+    assert all(result == expected for result in split_results)
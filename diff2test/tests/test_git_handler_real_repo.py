@@ -0,0 +1,126 @@
+import os
+import re
+import shutil
+import subprocess
+
+import pytest
+from diff2test.git_handler import get_current_changes, get_diff_between_commits
+
+# 작업 디렉토리(프로세스 전역 상태)를 바꾸는 테스트들이므로, 같은 xdist 워커에서 실행합니다.
+pytestmark = [
+    pytest.mark.xdist_group("io"),
+    pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed"),
+]
+
+
+@pytest.fixture
+def git_repo(tmp_path, monkeypatch):
+    """
+    사용자 설정의 영향을 받지 않는 빈 git 저장소를 만들고, 그 안에서 테스트를 실행합니다.
+    """
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    for name in ("GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"):
+        monkeypatch.setenv(name, "diff2test")
+    for name in ("GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"):
+        monkeypatch.setenv(name, "diff2test@example.com")
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    monkeypatch.chdir(repo)
+    _git("init", "-q")
+    return repo
+
+
+def _git(*args: str) -> None:
+    subprocess.run(["git", *args], check=True, capture_output=True)
+
+
+def test_commit_range_reports_only_changed_lines_of_renamed_file(git_repo):
+    """
+    실제 git 저장소에서 `git mv` 후 한 줄만 고친 파일이 파일 전체 추가가 아니라
+    이름 변경 헤더와 바뀐 한 줄로 보고되고, 새 파일과 모드 변경에는 해당 헤더가 담기는지 테스트합니다.
+    """
+    # given
+    (git_repo / "src").mkdir()
+    (git_repo / "src" / "calc.py").write_text(
+        "".join(f"value_{i} = {i}\n" for i in range(10)), encoding="utf-8"
+    )
+    (git_repo / "src" / "tool.py").write_text("run = True\n", encoding="utf-8")
+    _git("add", ".")
+    _git("commit", "-q", "-m", "initial")
+
+    (git_repo / "pkg").mkdir()
+    _git("mv", "src/calc.py", "pkg/calc.py")
+    (git_repo / "pkg" / "calc.py").write_text(
+        "".join(f"value_{i} = {i * 10 if i == 5 else i}\n" for i in range(10)),
+        encoding="utf-8",
+    )
+    (git_repo / "src" / "tool.py").write_text("run = False\n", encoding="utf-8")
+    (git_repo / "src" / "script.py").write_text("main = 1\n", encoding="utf-8")
+    _git("add", ".")
+    _git("add", "--chmod=+x", "src/tool.py", "src/script.py")
+    _git("commit", "-q", "-m", "rename and edit")
+
+    # when
+    diff_infos = {
+        d.file_path: d.diff_content
+        for d in get_diff_between_commits("HEAD~1", "HEAD", target=None)
+    }
+
+    # then
+    assert sorted(diff_infos) == ["pkg/calc.py", "src/script.py", "src/tool.py"]
+    # 유사도 점수는 git이 계산하므로 형식만 확인합니다.
+    header, similarity_line, rest = diff_infos["pkg/calc.py"].split("\n", 2)
+    assert header == "diff --git a/src/calc.py b/pkg/calc.py"
+    assert re.fullmatch(r"similarity index \d+%", similarity_line)
+    # index 줄의 blob 해시도 git이 정하므로 형식만 확인합니다.
+    assert re.fullmatch(
+        r"rename from src/calc\.py\n"
+        r"rename to pkg/calc\.py\n"
+        r"index [0-9a-f]+\.\.[0-9a-f]+ 100644\n"
+        r"--- a/src/calc\.py\n"
+        r"\+\+\+ b/pkg/calc\.py\n"
+        r"@@ -6 \+6 @@.*\n"
+        r"-value_5 = 5\n"
+        r"\+value_5 = 50",
+        rest,
+    )
+    assert diff_infos["src/script.py"].startswith(
+        "diff --git a/src/script.py b/src/script.py\nnew file mode 100755\n"
+    )
+    assert diff_infos["src/tool.py"].startswith(
+        "diff --git a/src/tool.py b/src/tool.py\nold mode 100644\nnew mode 100755\n"
+    )
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="symlinks are not supported")
+def test_typechange_does_not_shift_paths_of_following_files(git_repo):
+    """
+    심볼릭 링크가 일반 파일로 바뀐 경우(typechange), git이 한 파일에 대해 삭제/추가 두 섹션을 출력해도
+    그 뒤에 오는 파일의 경로와 diff가 어긋나지 않는지 테스트합니다.
+    """
+    # given
+    (git_repo / "pkg").mkdir()
+    (git_repo / "pkg" / "a.py").write_text("a = 1\n", encoding="utf-8")
+    (git_repo / "pkg" / "z.py").write_text("z = 1\n", encoding="utf-8")
+    os.symlink("a.py", git_repo / "pkg" / "link.py")
+    _git("add", ".")
+    _git("commit", "-q", "-m", "initial")
+
+    (git_repo / "pkg" / "a.py").write_text("a = 2\n", encoding="utf-8")
+    (git_repo / "pkg" / "link.py").unlink()
+    (git_repo / "pkg" / "link.py").write_text("link = 1\n", encoding="utf-8")
+    (git_repo / "pkg" / "z.py").write_text("z = 2\n", encoding="utf-8")
+
+    # when
+    diff_infos = {d.file_path: d.diff_content for d in get_current_changes(target=None)}
+
+    # then
+    assert sorted(diff_infos) == ["pkg/a.py", "pkg/link.py", "pkg/z.py"]
+    assert diff_infos["pkg/a.py"].endswith("-a = 1\n+a = 2")
+    # 링크 파일의 두 섹션(삭제, 추가)은 하나의 diff로 합쳐집니다.
+    assert diff_infos["pkg/link.py"].count("diff --git a/pkg/link.py b/pkg/link.py") == 2
+    assert "deleted file mode 120000" in diff_infos["pkg/link.py"]
+    assert diff_infos["pkg/link.py"].endswith("+link = 1")
+    assert diff_infos["pkg/z.py"].startswith("diff --git a/pkg/z.py b/pkg/z.py\n")
+    assert diff_infos["pkg/z.py"].endswith("-z = 1\n+z = 2")
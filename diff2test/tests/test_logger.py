@@ -1,8 +1,25 @@
+import importlib
+import io
 import logging
+import subprocess
+import sys
+
 import pytest
 from rich.logging import RichHandler
 
-from diff2test.logger import logger
+from diff2test.logger import (
+    LOG_LEVEL_ENV_VAR,
+    _StdoutHandler,
+    _create_handler,
+    _get_log_level,
+    logger,
+)
+
+# diff2test 패키지의 "logger" 속성은 로거 객체이므로, 모듈 자체는 sys.modules에서 가져옵니다.
+logger_module = sys.modules["diff2test.logger"]
+
+# 전역 "diff2test" 로거를 확인하고 변경하는 테스트들이므로, 하나의 xdist 워커에서 실행합니다.
+pytestmark = pytest.mark.xdist_group("logger")
 
 
 def test_logger_is_correctly_configured():
@@ -11,29 +28,30 @@ def test_logger_is_correctly_configured():
     """
     # then
     assert logger.name == "diff2test"
-    assert logger.level == logging.DEBUG
+    assert logger.level == _get_log_level()
     assert logger.propagate is False
     assert len(logger.handlers) == 1
-    assert isinstance(logger.handlers[0], RichHandler)
+    assert isinstance(logger.handlers[0], (RichHandler, logging.StreamHandler))
 
 
-def test_logger_does_not_add_duplicate_handlers():
+def test_logger_does_not_add_duplicate_handlers(monkeypatch):
     """
-    로거 모듈을 여러 번 import해도 핸들러가 중복으로 추가되지 않는지 테스트합니다.
+    로거 모듈이 다시 실행(importlib.reload)되어도 핸들러가 중복으로 추가되지 않는지 테스트합니다.
     """
     # given
-    initial_handler_count = len(logger.handlers)
+    initial_handlers = list(logger.handlers)
+    # reload는 모듈의 함수와 클래스를 새 객체로 바꾸므로, 테스트가 끝나면 원래 객체로 되돌립니다.
+    for name, value in list(vars(logger_module).items()):
+        monkeypatch.setattr(logger_module, name, value)
 
     # when
-    # 다른 모듈에서 logger를 import하는 상황을 시뮬레이션
-    # (실제로는 importlib.reload를 사용하는 것이 더 정확할 수 있음)
-    from diff2test import logger as logger2
-    from diff2test.logger import logger as logger3
+    importlib.reload(logger_module)
+    importlib.reload(logger_module)
 
     # then
-    assert len(logger.handlers) == initial_handler_count
-    assert len(logger2.handlers) == initial_handler_count
-    assert len(logger3.handlers) == initial_handler_count
+    assert logger_module.logger is logger
+    assert logger.handlers == initial_handlers
+    assert len(logger.handlers) == 1
 
 
 def test_log_output_with_caplog(caplog, monkeypatch):
@@ -58,3 +76,87 @@ def test_log_output_with_caplog(caplog, monkeypatch):
         record = caplog.records[0]
         assert record.levelname == "INFO"
         assert record.message == message
+
+
+class _FakeStdout(io.StringIO):
+    def __init__(self, is_tty: bool):
+        super().__init__()
+        self._is_tty = is_tty
+
+    def isatty(self) -> bool:
+        return self._is_tty
+
+
+@pytest.mark.parametrize(
+    "is_tty, expected_handler_type",
+    [(True, RichHandler), (False, _StdoutHandler)],
+)
+def test_create_handler_depends_on_tty(monkeypatch, is_tty, expected_handler_type):
+    """
+    터미널(TTY)에서는 RichHandler를, 파이프나 파일로 출력할 때는 StreamHandler를 사용하는지 테스트합니다.
+    """
+    # given
+    monkeypatch.setattr(sys, "stdout", _FakeStdout(is_tty))
+
+    # when
+    handler = _create_handler()
+
+    # then
+    assert type(handler) is expected_handler_type
+
+
+@pytest.mark.parametrize(
+    "env_value, expected_level",
+    [
+        (None, logging.INFO),
+        ("DEBUG", logging.DEBUG),
+        ("warning", logging.WARNING),
+        ("not-a-level", logging.INFO),
+    ],
+)
+def test_get_log_level_from_environment(monkeypatch, env_value, expected_level):
+    """
+    DIFF2TEST_LOG 환경 변수로 로그 레벨을 바꿀 수 있고,
+    값이 없거나 잘못되면 INFO를 사용하는지 테스트합니다.
+    """
+    # given
+    if env_value is None:
+        monkeypatch.delenv(LOG_LEVEL_ENV_VAR, raising=False)
+    else:
+        monkeypatch.setenv(LOG_LEVEL_ENV_VAR, env_value)
+
+    # when / then
+    assert _get_log_level() == expected_level
+
+
+def test_stdout_handler_follows_redirected_stdout(monkeypatch):
+    """
+    StreamHandler 대체 핸들러가 생성 이후에 바뀐 sys.stdout으로도 로그를 출력하는지 테스트합니다.
+    """
+    # given
+    handler = _StdoutHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    redirected_stdout = _FakeStdout(is_tty=False)
+    monkeypatch.setattr(sys, "stdout", redirected_stdout)
+
+    # when
+    handler.emit(logging.makeLogRecord({"msg": "piped message"}))
+
+    # then
+    assert redirected_stdout.getvalue() == "piped message\n"
+
+
+def test_logger_import_does_not_load_rich_when_piped():
+    """
+    출력이 파이프일 때 로거 모듈을 import해도 rich.logging을 불러오지 않는지 테스트합니다.
+    """
+    # given
+    code = "import sys, diff2test.logger; print('rich.logging' in sys.modules)"
+
+    # when
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+
+    # then
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,493 @@
+import logging
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from diff2test import _parse_selection, _prefetch, orchestrate_test_generation
+from diff2test.logger import logger
+from diff2test.models import AIConfig, DiffInfo
+
+
+def _make_diff_infos(count):
+    return [
+        DiffInfo(
+            file_path=f"src/module_{i}.py",
+            diff_content=f"--- a/src/module_{i}.py\n+++ b/src/module_{i}.py\n+x = {i}\n",
+        )
+        for i in range(count)
+    ]
+
+
+def _fake_save_batch(items, output_dir):
+    return [f"/abs/{output_dir}/{file_path}" for file_path, _ in items]
+
+
+def _saved_items(mock_save_batch):
+    """
+    save_test_codes_batch에 전달된 (파일 경로, 테스트 코드) 목록을 모든 호출에 걸쳐 모읍니다.
+    """
+    return [item for c in mock_save_batch.call_args_list for item in c.args[0]]
+
+
+@patch("diff2test.save_test_codes_batch", side_effect=_fake_save_batch)
+@patch("diff2test.generate_text_from_prompt")
+def test_parallel_generation_matches_results_to_files(
+    mock_generate_text, mock_save_batch
+):
+    """
+    비대화형 모드에서 AI 호출이 병렬로 실행되더라도,
+    각 파일에 해당하는 결과가 저장되는지 테스트합니다.
+    """
+    # given
+    diff_infos = _make_diff_infos(4)
+    ai_config = AIConfig(project_id="p1", region="r1")
+    all_requests_started = threading.Barrier(len(diff_infos), timeout=5)
+
+    def fake_generate(prompt, config):
+        # 모든 요청이 동시에 진행 중이어야만 통과할 수 있습니다.
+        all_requests_started.wait()
+        file_path = next(d.file_path for d in diff_infos if d.file_path in prompt)
+        return f"```python\ndef test_{file_path[4:-3]}():\n    assert True\n```"
+
+    mock_generate_text.side_effect = fake_generate
+
+    # when
+    orchestrate_test_generation(diff_infos, ai_config, output_dir="out")
+
+    # then
+    # 모든 결과는 원래 diff 순서대로 한 번에 저장됩니다.
+    mock_save_batch.assert_called_once()
+    saved_codes = dict(_saved_items(mock_save_batch))
+    assert list(saved_codes) == [d.file_path for d in diff_infos]
+    assert saved_codes["src/module_2.py"] == "def test_module_2():\n    assert True"
+
+
+@patch("diff2test.generate_text_from_prompt")
+def test_printed_results_keep_original_order(mock_generate_text, caplog, monkeypatch):
+    """
+    출력 디렉토리가 없을 때, 응답이 늦게 도착한 파일이 있어도
+    결과는 원래 diff 순서대로 출력되는지 테스트합니다.
+    """
+    # given
+    monkeypatch.setattr(logger, "propagate", True)
+    diff_infos = _make_diff_infos(3)
+    ai_config = AIConfig(project_id="p1", region="r1")
+
+    def fake_generate(prompt, config):
+        if "src/module_0.py" in prompt:
+            time.sleep(0.1)  # 첫 번째 파일의 응답이 가장 늦게 도착합니다.
+        file_path = next(d.file_path for d in diff_infos if d.file_path in prompt)
+        return f"def test_{file_path[4:-3]}(): pass"
+
+    mock_generate_text.side_effect = fake_generate
+
+    # when
+    with caplog.at_level(logging.INFO):
+        orchestrate_test_generation(diff_infos, ai_config, output_dir=None)
+
+    # then
+    printed = [r.message for r in caplog.records if r.message.startswith("def test_")]
+    assert printed == [f"def test_{d.file_path[4:-3]}(): pass" for d in diff_infos]
+
+
+@patch("diff2test.save_test_codes_batch", side_effect=_fake_save_batch)
+@patch("diff2test.generate_text_from_prompt", return_value=None)
+def test_failed_generation_is_not_saved(mock_generate_text, mock_save_batch):
+    """
+    AI 응답을 받지 못한 파일은 저장하지 않는지 테스트합니다.
+    """
+    # given
+    diff_infos = _make_diff_infos(2)
+    ai_config = AIConfig(project_id="p1", region="r1")
+
+    # when
+    orchestrate_test_generation(diff_infos, ai_config, output_dir="out")
+
+    # then
+    assert mock_generate_text.call_count == 2
+    mock_save_batch.assert_not_called()
+
+
+@patch(
+    "diff2test.save_test_codes_batch",
+    return_value=["/abs/out/src/test_module_0.py", None],
+)
+@patch("diff2test.generate_text_from_prompt", return_value="def test_x(): pass")
+def test_saved_files_are_reported(
+    mock_generate_text, mock_save_batch, caplog, monkeypatch
+):
+    """
+    저장에 성공한 파일마다 저장 경로를 출력하고, 마지막 요약에 실제로 저장된 파일 수를 보여주는지 테스트합니다.
+    """
+    # given
+    monkeypatch.setattr(logger, "propagate", True)
+    diff_infos = _make_diff_infos(2)
+    ai_config = AIConfig(project_id="p1", region="r1")
+
+    # when
+    with caplog.at_level(logging.INFO):
+        orchestrate_test_generation(diff_infos, ai_config, output_dir="out")
+
+    # then
+    messages = [r.getMessage() for r in caplog.records]
+    assert "Saved tests for src/module_0.py to: /abs/out/src/test_module_0.py" in messages
+    assert not any(m.startswith("Saved tests for src/module_1.py") for m in messages)
+    assert "\nProcessed 2 files. Saved 1 test file(s) to 'out'." in messages
+
+
+@patch("builtins.input", side_effect=["n", "y", "q"])
+@patch("diff2test.save_test_codes_batch", side_effect=_fake_save_batch)
+@patch("diff2test.generate_text_from_prompt", return_value="def test_x(): pass")
+def test_legacy_interactive_mode_generates_only_accepted_files(
+    mock_generate_text, mock_save_batch, mock_input
+):
+    """
+    기존 대화형 모드(--interactive-legacy)에서 사용자가 승인한 파일만 처리하고,
+    'q' 입력 시 중단하는지 테스트합니다.
+    """
+    # given
+    diff_infos = _make_diff_infos(4)
+    ai_config = AIConfig(project_id="p1", region="r1")
+
+    # when
+    orchestrate_test_generation(
+        diff_infos, ai_config, output_dir="out", interactive_legacy=True
+    )
+
+    # then
+    assert mock_input.call_count == 3
+    assert mock_generate_text.call_count == 1
+    mock_save_batch.assert_called_once_with(
+        [("src/module_1.py", "def test_x(): pass")], "out"
+    )
+
+
+@patch("diff2test.save_test_codes_batch", side_effect=_fake_save_batch)
+@patch("diff2test.generate_text_from_prompt")
+def test_batching_sends_small_diffs_in_one_request(
+    mock_generate_text, mock_save_batch
+):
+    """
+    배치 모드에서 작은 diff들을 하나의 요청으로 묶고,
+    응답을 파일별로 나누어 저장하는지 테스트합니다.
+    """
+    # given
+    diff_infos = _make_diff_infos(3)
+    ai_config = AIConfig(project_id="p1", region="r1")
+    mock_generate_text.return_value = "".join(
+        f"<<<FILE {d.file_path}>>>\ndef test_{i}(): pass\n<<<END>>>\n"
+        for i, d in enumerate(diff_infos)
+    )
+
+    # when
+    orchestrate_test_generation(
+        diff_infos, ai_config, output_dir="out", batch_token_budget=6000
+    )
+
+    # then
+    mock_generate_text.assert_called_once()
+    assert _saved_items(mock_save_batch) == [
+        (d.file_path, f"def test_{i}(): pass") for i, d in enumerate(diff_infos)
+    ]
+
+
+@patch("diff2test.save_test_codes_batch", side_effect=_fake_save_batch)
+@patch("diff2test.generate_text_from_prompt", return_value="def test_x(): pass")
+def test_batching_respects_token_budget(mock_generate_text, mock_save_batch):
+    """
+    예상 토큰 수가 배치 예산을 넘으면 요청을 나누는지 테스트합니다.
+    """
+    # given
+    diff_infos = _make_diff_infos(3)
+    ai_config = AIConfig(project_id="p1", region="r1")
+
+    # when
+    # 각 diff는 약 15 토큰이므로, 예산 20이면 파일마다 별도 요청이 됩니다.
+    orchestrate_test_generation(
+        diff_infos, ai_config, output_dir="out", batch_token_budget=20
+    )
+
+    # then
+    assert mock_generate_text.call_count == 3
+    assert len(_saved_items(mock_save_batch)) == 3
+
+
+@patch("diff2test.save_test_codes_batch", side_effect=_fake_save_batch)
+@patch("diff2test.generate_text_from_prompt", return_value="def test_x(): pass")
+def test_diffs_without_line_changes_are_skipped(
+    mock_generate_text, mock_save_batch
+):
+    """
+    내용이 없거나, 파일 모드만 바뀌었거나, 바이너리인 diff는 AI를 호출하지 않고 건너뛰는지 테스트합니다.
+    """
+    # given
+    diff_infos = [
+        DiffInfo(file_path="src/empty.py", diff_content="   \n"),
+        DiffInfo(
+            file_path="src/mode_only.py",
+            diff_content=(
+                "diff --git a/src/mode_only.py b/src/mode_only.py\n"
+                "old mode 100644\n"
+                "new mode 100755\n"
+            ),
+        ),
+        DiffInfo(
+            file_path="src/headers_only.py",
+            diff_content="--- a/src/headers_only.py\n+++ b/src/headers_only.py\n",
+        ),
+        DiffInfo(
+            file_path="src/binary.py",
+            diff_content="Binary files a/src/binary.py and b/src/binary.py differ\n",
+        ),
+        DiffInfo(
+            file_path="src/changed.py",
+            diff_content="--- a/src/changed.py\n+++ b/src/changed.py\n-old\n+new\n",
+        ),
+    ]
+    ai_config = AIConfig(project_id="p1", region="r1")
+
+    # when
+    orchestrate_test_generation(diff_infos, ai_config, output_dir="out")
+
+    # then
+    mock_generate_text.assert_called_once()
+    mock_save_batch.assert_called_once_with(
+        [("src/changed.py", "def test_x(): pass")], "out"
+    )
+
+
+@patch("diff2test.save_test_codes_batch", side_effect=_fake_save_batch)
+@patch("diff2test.generate_text_from_prompt", return_value="def test_x(): pass")
+def test_output_token_budget_scales_with_diff_size(
+    mock_generate_text, mock_save_batch
+):
+    """
+    diff 크기에 맞춰 max_output_tokens를 줄이되, 설정된 최대값을 넘지 않는지 테스트합니다.
+    """
+    # given
+    small_diff = DiffInfo(file_path="src/small.py", diff_content="+x = 1\n+y = 2")
+    large_diff = DiffInfo(
+        file_path="src/large.py", diff_content="\n".join(["+x = 1"] * 1000)
+    )
+    ai_config = AIConfig(project_id="p1", region="r1")
+
+    # when
+    orchestrate_test_generation([small_diff, large_diff], ai_config, output_dir="out")
+
+    # then
+    budgets = {c.args[1].max_output_tokens for c in mock_generate_text.call_args_list}
+    assert budgets == {256 + 4 * 2, 2048}
+    assert ai_config.max_output_tokens == 2048  # 공유 설정은 변경되지 않아야 합니다.
+
+
+@patch("builtins.input", side_effect=["2-9", "1,3-4"])
+@patch("diff2test.save_test_codes_batch", side_effect=_fake_save_batch)
+@patch("diff2test.generate_text_from_prompt", return_value="def test_x(): pass")
+def test_interactive_mode_selects_files_up_front(
+    mock_generate_text, mock_save_batch, mock_input
+):
+    """
+    대화형 모드에서 파일 목록을 한 번에 보여주고, 잘못된 입력은 다시 묻고,
+    선택된 파일만 처리하는지 테스트합니다.
+    """
+    # given
+    diff_infos = _make_diff_infos(4)
+    ai_config = AIConfig(project_id="p1", region="r1")
+
+    # when
+    orchestrate_test_generation(
+        diff_infos, ai_config, output_dir="out", interactive=True
+    )
+
+    # then
+    assert mock_input.call_count == 2
+    assert [file_path for file_path, _ in _saved_items(mock_save_batch)] == [
+        "src/module_0.py",
+        "src/module_2.py",
+        "src/module_3.py",
+    ]
+
+
+@patch("builtins.input", return_value="q")
+@patch("diff2test.generate_text_from_prompt")
+def test_interactive_mode_quit(mock_generate_text, mock_input):
+    """
+    대화형 모드에서 'q'를 입력하면 AI 호출 없이 종료하는지 테스트합니다.
+    """
+    # given
+    diff_infos = _make_diff_infos(2)
+    ai_config = AIConfig(project_id="p1", region="r1")
+
+    # when
+    orchestrate_test_generation(
+        diff_infos, ai_config, output_dir="out", interactive=True
+    )
+
+    # then
+    mock_generate_text.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("1", [0]),
+        ("1,3,5-8", [0, 2, 4, 5, 6, 7]),
+        (" 3 , 1-2 ,", [0, 1, 2]),
+        ("2,2-3", [1, 2]),
+        ("a", list(range(10))),
+        ("ALL", list(range(10))),
+    ],
+)
+def test_parse_selection(text, expected):
+    """
+    선택 문자열(번호, 범위, 전체)을 0부터 시작하는 인덱스 목록으로 올바르게 변환하는지 테스트합니다.
+    """
+    assert _parse_selection(text, 10) == expected
+
+
+@pytest.mark.parametrize("text", ["", "x", "0", "11", "3-1", "1-x", ","])
+def test_parse_selection_rejects_invalid_input(text):
+    """
+    비어 있거나, 숫자가 아니거나, 범위를 벗어난 선택은 ValueError를 발생시키는지 테스트합니다.
+    """
+    with pytest.raises(ValueError):
+        _parse_selection(text, 10)
+
+
+@patch("diff2test.save_test_codes_batch", side_effect=_fake_save_batch)
+@patch("diff2test.generate_text_from_prompt", return_value="def test_x(): pass")
+def test_identical_diffs_are_generated_once(mock_generate_text, mock_save_batch):
+    """
+    내용이 완전히 같은 diff가 여러 번 포함되어 있으면 AI는 한 번만 호출하고,
+    결과는 모든 중복 항목에 전달되는지 테스트합니다.
+    """
+    # given
+    unique_diff, other_diff = _make_diff_infos(2)
+    duplicate_diff = DiffInfo(
+        file_path=unique_diff.file_path, diff_content=unique_diff.diff_content
+    )
+    ai_config = AIConfig(project_id="p1", region="r1")
+
+    # when
+    orchestrate_test_generation(
+        [unique_diff, other_diff, duplicate_diff], ai_config, output_dir="out"
+    )
+
+    # then
+    assert mock_generate_text.call_count == 2
+    assert len(_saved_items(mock_save_batch)) == 3
+
+
+@patch("diff2test.save_test_codes_batch", side_effect=_fake_save_batch)
+@patch("diff2test.generate_text_from_prompt", return_value="def test_x(): pass")
+def test_cached_test_code_skips_ai_requests(
+    mock_generate_text, mock_save_batch, tmp_path, monkeypatch
+):
+    """
+    캐시가 켜져 있을 때, 이전 실행에서 테스트 코드를 만든 diff는 AI를 다시 호출하지 않고
+    바뀐 diff만 요청하며, 모든 파일의 결과는 그대로 저장되는지 테스트합니다.
+    """
+    # given
+    monkeypatch.setenv("DTT_CACHE_DIR", str(tmp_path))
+    diff_infos = _make_diff_infos(3)
+    ai_config = AIConfig(project_id="p1", region="r1", use_cache=True)
+    orchestrate_test_generation(diff_infos, ai_config, output_dir="out")
+    mock_generate_text.reset_mock()
+    mock_save_batch.reset_mock()
+    changed_diff = DiffInfo(
+        file_path=diff_infos[1].file_path,
+        diff_content=diff_infos[1].diff_content + "+y = 1\n",
+    )
+
+    # when
+    orchestrate_test_generation(
+        [diff_infos[0], changed_diff, diff_infos[2]], ai_config, output_dir="out"
+    )
+
+    # then
+    mock_generate_text.assert_called_once()
+    assert "+y = 1" in mock_generate_text.call_args.args[0]
+    assert len(_saved_items(mock_save_batch)) == 3
+
+
+@patch("diff2test.save_test_codes_batch", side_effect=_fake_save_batch)
+@patch("diff2test.generate_text_from_prompt", return_value="def test_x(): pass")
+def test_test_code_cache_is_off_without_use_cache(
+    mock_generate_text, mock_save_batch, tmp_path, monkeypatch
+):
+    """
+    캐시가 꺼져 있으면(--no-cache, use_cache=False) 생성된 테스트 코드를 캐시에 쓰지도 읽지도 않고,
+    매번 AI를 호출하는지 테스트합니다.
+    """
+    # given
+    monkeypatch.setenv("DTT_CACHE_DIR", str(tmp_path))
+    diff_infos = _make_diff_infos(2)
+    ai_config = AIConfig(project_id="p1", region="r1", use_cache=False)
+
+    # when
+    orchestrate_test_generation(diff_infos, ai_config, output_dir="out")
+    orchestrate_test_generation(diff_infos, ai_config, output_dir="out")
+
+    # then
+    assert mock_generate_text.call_count == 4
+    assert list(tmp_path.iterdir()) == []
+
+
+@patch("diff2test.warm_up_vertex_ai")
+@patch("diff2test.save_test_codes_batch", side_effect=_fake_save_batch)
+@patch("diff2test.generate_text_from_prompt", return_value="def test_x(): pass")
+def test_warm_up_is_skipped_when_every_test_is_cached(
+    mock_generate_text, mock_save_batch, mock_warm_up, tmp_path, monkeypatch
+):
+    """
+    모든 diff의 테스트 코드가 캐시에 있으면 AI 요청을 보내지 않으므로 Vertex AI 워밍업도 하지 않고,
+    캐시되지 않은 diff가 있을 때만 워밍업하는지 테스트합니다.
+    """
+    # given
+    monkeypatch.setenv("DTT_CACHE_DIR", str(tmp_path))
+    diff_infos = _make_diff_infos(2)
+    ai_config = AIConfig(project_id="p1", region="r1", use_cache=True)
+    orchestrate_test_generation(diff_infos, ai_config, output_dir="out", warm_up=True)
+    mock_warm_up.assert_called_once_with(ai_config)
+    mock_warm_up.reset_mock()
+    mock_generate_text.reset_mock()
+
+    # when
+    orchestrate_test_generation(diff_infos, ai_config, output_dir="out", warm_up=True)
+
+    # then
+    mock_warm_up.assert_not_called()
+    mock_generate_text.assert_not_called()
+    assert len(_saved_items(mock_save_batch)) == 4
+
+
+def test_prefetch_yields_items_in_order():
+    """
+    _prefetch가 백그라운드 스레드에서 만든 항목을 원래 순서대로 전달하는지 테스트합니다.
+    """
+    # when
+    items = list(_prefetch(iter(range(10)), maxsize=2))
+
+    # then
+    assert items == list(range(10))
+
+
+def test_prefetch_reraises_producer_error():
+    """
+    항목 생성 중 발생한 예외가 호출한 쪽에서 다시 발생하는지 테스트합니다.
+    """
+
+    # given
+    def failing_items():
+        yield 1
+        raise ValueError("boom")
+
+    # when
+    prefetched = _prefetch(failing_items(), maxsize=2)
+
+    # then
+    assert next(prefetched) == 1
+    with pytest.raises(ValueError, match="boom"):
+        next(prefetched)
@@ -1,5 +1,8 @@
 from diff2test.models import DiffInfo
-from diff2test.prompt_builder import create_test_prompt_for_diff
+from diff2test.prompt_builder import (
+    create_batch_test_prompt_for_diffs,
+    create_test_prompt_for_diff,
+)
 
 
 def test_create_test_prompt_for_diff():
@@ -48,4 +51,45 @@ def test_prompt_with_empty_diff_content():
     # then
     assert f"The code changes are in the file: `{diff_info.file_path}`" in prompt
     assert "```diff\n\n```" in prompt  # Empty diff content
-    assert "Instructions for your response:" in prompt 
\ No newline at end of file
+    assert "Instructions for your response:" in prompt 
+
+
+def test_create_batch_test_prompt_for_diffs():
+    """
+    여러 DiffInfo 객체로 하나의 배치 프롬프트를 만들 때,
+    모든 파일의 diff와 파일별 구분자 안내가 포함되는지 테스트합니다.
+    """
+    # given
+    diff_infos = [
+        DiffInfo(file_path="src/a.py", diff_content="+def a():\n+    return 1\n"),
+        DiffInfo(file_path="src/b.py", diff_content="+def b():\n+    return 2\n"),
+    ]
+
+    # when
+    prompt = create_batch_test_prompt_for_diffs(diff_infos)
+
+    # then
+    assert "=== FILE: src/a.py ===" in prompt
+    assert "=== FILE: src/b.py ===" in prompt
+    assert prompt.index("src/a.py") < prompt.index("src/b.py")
+    for diff_info in diff_infos:
+        assert diff_info.diff_content in prompt
+    assert "<<<FILE {file_path}>>>" in prompt
+    assert "<<<END>>>" in prompt
+
+
+def test_prompt_uses_given_test_framework():
+    """
+    테스트 프레임워크를 지정하면 프롬프트의 모든 프레임워크 언급이 해당 값으로 바뀌고,
+    diff 내용의 '$' 문자는 그대로 유지되는지 테스트합니다.
+    """
+    # given
+    diff_info = DiffInfo(file_path="src/price.py", diff_content="+PRICE = '$10'\n")
+
+    # when
+    prompt = create_test_prompt_for_diff(diff_info, test_framework="unittest")
+
+    # then
+    assert "pytest" not in prompt
+    assert prompt.count("unittest") == 3
+    assert "+PRICE = '$10'" in prompt
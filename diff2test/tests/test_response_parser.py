@@ -1,4 +1,8 @@
-from diff2test.response_parser import extract_python_code_from_response
+import pytest
+from diff2test.response_parser import (
+    extract_python_code_from_response,
+    extract_python_code_per_file,
+)
 
 
 def test_extract_code_with_standard_markdown():
@@ -46,6 +50,20 @@ def test_extract_code_with_no_python_code():
     assert extracted_code is None
 
 
+def test_extract_code_ignores_keywords_inside_words():
+    """
+    산문 속 단어에 키워드가 포함된 경우(reimport, assertion 등), 코드로 판단하지 않는지 테스트합니다.
+    """
+    # given
+    response_text = "A reimport of this module is not an assertion about its classes."
+
+    # when
+    extracted_code = extract_python_code_from_response(response_text)
+
+    # then
+    assert extracted_code is None
+
+
 def test_extract_code_with_multiple_code_blocks():
     """
     여러 개의 코드 블록이 있을 때, 첫 번째 파이썬 코드 블록만 추출하는지 테스트합니다.
@@ -118,4 +136,47 @@ def test_response_with_just_backticks():
     extracted_code = extract_python_code_from_response(response_text)
 
     # then
-    assert extracted_code == expected_code 
\ No newline at end of file
+    assert extracted_code == expected_code 
+
+
+@pytest.mark.parametrize(
+    "response_text, expected_code",
+    [
+        ("```py\nx = 1\n```", "x = 1"),
+        ("```PYTHON  \n\n    assert f()\n```", "assert f()"),
+        ("```python\n\n```", ""),
+        ("```js\nconsole.log(1)\n```\ndone", None),
+        ("```python\nx = 1", None),
+    ],
+)
+def test_extract_code_fence_variants(response_text, expected_code):
+    """
+    언어 태그(py, 대소문자), 태그 뒤 공백/빈 줄, 빈 블록, 닫히지 않은 블록 등
+    코드 펜스의 여러 형태를 올바르게 처리하는지 테스트합니다.
+    """
+    # when
+    extracted_code = extract_python_code_from_response(response_text)
+
+    # then
+    assert extracted_code == expected_code
+
+
+def test_extract_code_per_file_from_batched_response():
+    """
+    배치 응답에서 파일별 블록을 나누어 각 파일의 코드를 추출하는지 테스트합니다.
+    """
+    # given
+    response_text = (
+        "<<<FILE src/a.py>>>\n```python\ndef test_a():\n    assert True\n```\n<<<END>>>\n"
+        "<<<FILE src/b.py>>>\nNO_TESTS_NEEDED\n<<<END>>>\n"
+        "<<<FILE src/c.py>>>\nSorry, I cannot help with this file.\n<<<END>>>"
+    )
+
+    # when
+    codes_by_file = extract_python_code_per_file(response_text)
+
+    # then
+    assert codes_by_file == {
+        "src/a.py": "def test_a():\n    assert True",
+        "src/b.py": "NO_TESTS_NEEDED",
+    }